@@ -1,38 +1,219 @@
+import hashlib
 import json
 import os
 import re
+from multiprocessing import Pool
 
-re_xref_id = re.compile(r"(<[Rr][Ee][Ff] (.*?)>)")
-re_xref_em_id = re.compile(r"(<EMID (.*?)>)")
+from library.text_db import write_text_db_bin
 
+# group(1) 为 REF 时是条目名引用，否则为 EMID 敌人名引用
+re_xref_tag = re.compile(r"<(?:([Rr][Ee][Ff])|EMID) (.*?)>")
+
+MANIFEST_VERSION = 1
+MANIFEST_PATH = "texts_db.manifest.json"
+
+
+def dump_text_db_json(input_dir: str, processes: int = 1) -> dict[str, dict]:
+    msg_paths = find_msg_files(input_dir)
+    file_entries = parse_msg_files(msg_paths, processes)
+
+    db_entries = merge_msg_entries(file_entries)
+    db_entries = process_xref(db_entries)
+    return list(db_entries.values())
+
+
+# 增量构建：只重新解析内容变化的msg文件，只对引用链受影响的条目重新处理XREF
+# 返回 (texts_db条目列表, 新manifest)
+def dump_text_db_json_incremental(
+    input_dir: str,
+    manifest_path: str,
+    prev_db_path: str,
+    processes: int = 1,
+) -> tuple[list[dict], dict]:
+    prev_manifest = load_manifest(manifest_path)
+    prev_db = load_prev_db(prev_db_path) if prev_manifest else None
+    if prev_db is None:
+        # 缺少上次的输出，无法复用
+        prev_manifest = {"version": MANIFEST_VERSION, "files": {}}
+        prev_db = {}
+    prev_files = prev_manifest["files"]
+
+    msg_paths = find_msg_files(input_dir)
+    file_records = {}
+    changed_paths = []
+    for path in msg_paths:
+        stat = os.stat(path)
+        prev_record = prev_files.get(path)
+        if prev_record is not None and (
+            prev_record["mtime_ns"] == stat.st_mtime_ns
+            and prev_record["size"] == stat.st_size
+        ):
+            file_records[path] = prev_record
+            continue
+        sha1 = get_file_sha1(path)
+        if prev_record is not None and prev_record["sha1"] == sha1:
+            # 仅时间戳变化
+            prev_record["mtime_ns"] = stat.st_mtime_ns
+            prev_record["size"] = stat.st_size
+            file_records[path] = prev_record
+            continue
+        file_records[path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": sha1,
+        }
+        changed_paths.append(path)
+    print(f"Changed msg files: {len(changed_paths)}/{len(msg_paths)}")
+
+    # 变化（含新增、删除）文件涉及的条目名
+    changed_names = set()
+    for path, prev_record in prev_files.items():
+        if path not in file_records or path in changed_paths:
+            changed_names.update(e["name"] for e in prev_record["entries"])
+
+    for path, entries in zip(changed_paths, parse_msg_files(changed_paths, processes)):
+        file_records[path]["entries"] = entries
+        file_records[path]["refs"] = [sorted(get_xref_names(e)) for e in entries]
+        changed_names.update(e["name"] for e in entries)
+
+    db_entries = merge_msg_entries(
+        [file_records[path]["entries"] for path in msg_paths]
+    )
+    xref_names = {}
+    for path in msg_paths:
+        record = file_records[path]
+        for entry, refs in zip(record["entries"], record["refs"]):
+            xref_names[entry["name"]] = refs
+
+    # 沿反向引用传播，找出所有需要重新处理XREF的条目
+    referenced_by = {}
+    for name, refs in xref_names.items():
+        for ref in refs:
+            referenced_by.setdefault(ref, []).append(name)
+    dirty_names = set()
+    pending = list(changed_names)
+    pending.extend(name for name in db_entries if name not in prev_db)
+    while pending:
+        name = pending.pop()
+        if name in dirty_names:
+            continue
+        dirty_names.add(name)
+        pending.extend(referenced_by.get(name, []))
+    dirty_names &= db_entries.keys()
+    print(f"Re-processing xref of {len(dirty_names)}/{len(db_entries)} entries")
+
+    # XREF处理会修改条目内容，manifest中需要保留原始内容
+    resolve_entries = {}
+    for name, entry in db_entries.items():
+        resolve_entries[name] = dict(entry, contents=dict(entry["contents"]))
+    process_xref(resolve_entries, dirty_names)
+
+    output = []
+    for name, entry in resolve_entries.items():
+        if name not in dirty_names:
+            entry["contents"] = prev_db[name]["contents"]
+        output.append(entry)
+
+    manifest = {"version": MANIFEST_VERSION, "files": file_records}
+    return output, manifest
+
+
+def get_file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+# 获取条目中引用的其他条目名（REF/EMID）
+def get_xref_names(entry: dict) -> set[str]:
+    names = set()
+    for content in entry["contents"].values():
+        for match in re_xref_tag.finditer(content):
+            names.add(get_xref_target(match))
+    return names
+
+
+def load_manifest(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    # JSON 键只能是字符串，恢复语言id为int
+    for record in manifest["files"].values():
+        for entry in record["entries"]:
+            entry["contents"] = {int(k): v for k, v in entry["contents"].items()}
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
 
-def dump_text_db_json(input_dir: str) -> dict[str, dict]:
-    db_entries = {}
 
+def load_prev_db(path: str) -> dict[str, dict] | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        db_json = json.load(f)
+    return {entry["name"]: entry for entry in db_json}
+
+
+# 按 os.walk 顺序收集所有 *.msg.23.json 文件，保证串行与并行结果一致
+def find_msg_files(input_dir: str) -> list[str]:
+    msg_paths = []
     for root, dirs, files in os.walk(input_dir):
         for file in files:
             if not file.endswith(".msg.23.json"):
                 continue
+            msg_paths.append(os.path.join(root, file))
+    return msg_paths
 
-            data = None
-            with open(os.path.join(root, file), "r", encoding="utf-8") as f:
-                data = f.read()
-
-            data = json.loads(data)
-            for entry in data["entries"]:
-                if entry["content"] == None:
-                    continue
-                contents = content_list_to_dict(entry["content"])
-                db_entry = {
-                    "name": entry["name"],
-                    "guid": entry["guid"],
-                    "belongs_to": file,
-                    "contents": contents,
-                }
-                db_entries[entry["name"]] = db_entry
 
-    db_entries = process_xref(db_entries)
-    return list(db_entries.values())
+# 解析单个msg文件，返回该文件内的所有条目
+def parse_msg_file(path: str) -> list[dict]:
+    data = None
+    with open(path, "r", encoding="utf-8") as f:
+        data = f.read()
+
+    data = json.loads(data)
+    file = os.path.basename(path)
+    entries = []
+    for entry in data["entries"]:
+        if entry["content"] == None:
+            continue
+        contents = content_list_to_dict(entry["content"])
+        db_entry = {
+            "name": entry["name"],
+            "guid": entry["guid"],
+            "belongs_to": file,
+            "contents": contents,
+        }
+        entries.append(db_entry)
+    return entries
+
+
+# 解析多个msg文件，processes > 1 时使用进程池，结果顺序与输入顺序一致
+def parse_msg_files(paths: list[str], processes: int = 1) -> list[list[dict]]:
+    if processes <= 1 or len(paths) <= 1:
+        return [parse_msg_file(path) for path in paths]
+
+    with Pool(processes) as pool:
+        # map 保证结果按输入顺序返回
+        chunksize = max(1, len(paths) // (processes * 4))
+        return pool.map(parse_msg_file, paths, chunksize=chunksize)
+
+
+# 按文件顺序合并条目，同名条目后者覆盖前者
+def merge_msg_entries(file_entries: list[list[dict]]) -> dict[str, dict]:
+    db_entries = {}
+    for entries in file_entries:
+        for db_entry in entries:
+            db_entries[db_entry["name"]] = db_entry
+    return db_entries
 
 
 def content_list_to_dict(contents: list) -> dict:
@@ -44,44 +225,102 @@ def content_list_to_dict(contents: list) -> dict:
     return content_dict
 
 
-def process_xref(db_entries: dict[str, dict]) -> dict[str, dict]:
-    for entry in db_entries.values():
-        new_entry = replace_xref_tag_in_entry(entry, db_entries)
-        db_entries[entry["name"]] = new_entry
+# 处理所有（或指定的）条目中的 REF/EMID 引用
+def process_xref(
+    db_entries: dict[str, dict], names: set[str] | None = None
+) -> dict[str, dict]:
+    resolver = XrefResolver(db_entries)
+    resolved = {}
+    for name, entry in db_entries.items():
+        if names is not None and name not in names:
+            continue
+        resolved[name] = {
+            lang_id: resolver.resolve(name, lang_id) for lang_id in entry["contents"]
+        }
+    # 全部解析完成后再写回，解析过程中始终读取原始内容
+    for name, contents in resolved.items():
+        db_entries[name]["contents"] = contents
+    if resolver.cycles:
+        print(f"Found {len(resolver.cycles)} XREF cycles, left unresolved")
     return db_entries
 
 
-def replace_xref_tag_in_entry(entry: dict, db_entries: dict[str, dict]) -> dict:
-    for i, content in entry["contents"].items():
-        content = replace_xref_tag_in_content(content, i, db_entries)
-        entry["contents"][i] = content
-    return entry
-
-
-def replace_xref_tag_in_content(
-    content: str, lang_id: int, db_entries: dict[str, dict]
-) -> str:
-    line = content
-    xrefs = re_xref_id.findall(line)
-    for xref in xrefs:
-        xref_tag = xref[0]
-        xref_name = xref[1]
-        xref_entry = db_entries.get(xref_name)
-        if xref_entry:
-            line = line.replace(xref_tag, xref_entry["contents"][lang_id], 1)
-            line = replace_xref_tag_in_content(line, lang_id, db_entries)
-    xrefs = re_xref_em_id.findall(line)
-    for xref in xrefs:
-        xref_tag = xref[0]
-        xref_name = xref[1]
-        tag = f"EnemyText_NAME_{xref_name}"
-        xref_entry = db_entries.get(tag)
-        if xref_entry:
-            line = line.replace(xref_tag, xref_entry["contents"][lang_id], 1)
-            line = replace_xref_tag_in_content(line, lang_id, db_entries)
-    return line
-
-
-output = dump_text_db_json("natives")
-with open("texts_db.json", "w", encoding="utf-8") as f:
-    json.dump(output, f, ensure_ascii=False, indent=4)
+# 将引用名转换为目标条目名
+def get_xref_target(match: re.Match) -> str:
+    if match.group(1) is None:
+        return f"EnemyText_NAME_{match.group(2)}"
+    return match.group(2)
+
+
+class XrefResolver:
+    """
+    带缓存的XREF解析器。
+
+    每条原始文本只扫描一次，拆分为文本片段和引用目标；每个 (条目, 语言) 只解析一次。
+    遇到循环引用时保留原标签并记录到 cycles。
+    """
+
+    def __init__(self, db_entries: dict[str, dict]):
+        self._db_entries = db_entries
+        self._resolved = {}
+        self._resolving = []
+        self.cycles = []
+
+    # 将文本拆分为 [文本, (标签, 目标名), 文本, ...]
+    def _parse(self, content: str) -> list:
+        parts = []
+        pos = 0
+        for match in re_xref_tag.finditer(content):
+            target = get_xref_target(match)
+            if target not in self._db_entries:
+                continue
+            parts.append(content[pos : match.start()])
+            parts.append((match.group(0), target))
+            pos = match.end()
+        parts.append(content[pos:])
+        return parts
+
+    def resolve(self, name: str, lang_id: int) -> str:
+        key = (name, lang_id)
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            return resolved
+
+        content = self._db_entries[name]["contents"][lang_id]
+        parts = self._parse(content)
+        if len(parts) == 1:
+            self._resolved[key] = content
+            return content
+
+        self._resolving.append(key)
+        texts = []
+        for part in parts:
+            if isinstance(part, str):
+                texts.append(part)
+                continue
+            tag, target = part
+            target_key = (target, lang_id)
+            if target_key in self._resolving:
+                cycle = self._resolving[self._resolving.index(target_key) :]
+                cycle = [n for n, _ in cycle] + [target]
+                self.cycles.append(cycle)
+                print(f"XREF cycle (lang {lang_id}): {' -> '.join(cycle)}")
+                texts.append(tag)
+                continue
+            texts.append(self.resolve(target, lang_id))
+        self._resolving.pop()
+
+        resolved = "".join(texts)
+        self._resolved[key] = resolved
+        return resolved
+
+
+if __name__ == "__main__":
+    output, manifest = dump_text_db_json_incremental(
+        "natives", MANIFEST_PATH, "texts_db.json", processes=os.cpu_count() or 1
+    )
+    with open("texts_db.json", "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=4)
+    write_text_db_bin(output, "texts_db.bin")
+    # texts_db.json 写入完成后再更新manifest
+    save_manifest(MANIFEST_PATH, manifest)
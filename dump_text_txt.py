@@ -2,9 +2,9 @@ import json
 import os
 import re
 
-from library.text_db import load_text_db
+from library.text_db import g_default_lang, load_text_db
 
-text_db = load_text_db("texts_db.json")
+text_db = load_text_db("texts_db.json", langs=[g_default_lang])
 re_xref_id = re.compile(r"<REF (.*?)>")
 re_xref_em_id = re.compile(r"<EMID (.*?)>")
 
@@ -0,0 +1,57 @@
+import functools
+import os
+from typing import Callable
+
+import pandas as pd
+
+import library.text_db as text_db
+from library.user_data import get_file_hash
+
+# 进程内的中间结果缓存 (函数, 参数, 输入文件hash) -> 结果
+g_artifacts = {}
+
+
+def _copy_artifact(obj):
+    if isinstance(obj, pd.DataFrame):
+        return obj.copy()
+    if isinstance(obj, dict):
+        return {k: _copy_artifact(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_copy_artifact(v) for v in obj)
+    return obj
+
+
+def artifact(inputs: list[str] | Callable[[], list[str]] | None = None):
+    """
+    缓存函数返回的中间结果（DataFrame 或其容器），同一进程内相同调用只计算一次。
+
+    缓存键由 函数、参数、输入文件hash 和 全局默认语言 组成，参数中存在的文件路径会自动作为输入。
+    每次返回结果的副本，调用方可以增删行列，但不应原地修改单元格内的 list 等对象。
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            input_paths = inputs() if callable(inputs) else list(inputs or [])
+            for arg in [*args, *kwargs.values()]:
+                if isinstance(arg, str) and os.path.isfile(arg):
+                    input_paths.append(arg)
+            key = (
+                func.__module__,
+                func.__qualname__,
+                args,
+                tuple(sorted(kwargs.items())),
+                tuple((path, get_file_hash(path)) for path in input_paths),
+                text_db.g_default_lang,
+            )
+            if key not in g_artifacts:
+                g_artifacts[key] = func(*args, **kwargs)
+            return _copy_artifact(g_artifacts[key])
+
+        return wrapper
+
+    return decorator
+
+
+def clear_artifacts():
+    g_artifacts.clear()
@@ -0,0 +1,28 @@
+import numpy as np
+
+
+# 单次抽取概率为 p 时，N 次内至少获得一次的概率：1 - (1 - p)^N
+# 返回形状为 probs.shape + (max_rolls,)，第 k 项为 k+1 次内的概率
+def roll_curves(probs, max_rolls: int) -> np.ndarray:
+    probs = np.asarray(probs, dtype=float)
+    rolls = np.arange(1, max_rolls + 1)
+    # log1p/expm1 保证小概率时的精度
+    with np.errstate(divide="ignore"):
+        log_miss = np.log1p(-probs)
+    return -np.expm1(log_miss[..., None] * rolls)
+
+
+# 以 confidence 的把握至少获得一次所需的抽取次数，概率为0时返回0
+def rolls_for_confidence(probs, confidence: float) -> np.ndarray:
+    probs = np.asarray(probs, dtype=float)
+    valid = (probs > 0) & (probs < 1)
+    safe_probs = np.where(valid, probs, 0.5)
+    log_miss = np.log1p(-safe_probs)
+    rolls = np.ceil(np.log1p(-confidence) / log_miss)
+    # 浮点误差可能使结果多出一次，用前一次的累计概率校正
+    prev = np.maximum(rolls - 1, 1)
+    prev_ok = (rolls > 1) & (-np.expm1(log_miss * prev) >= confidence)
+    rolls = np.where(prev_ok, prev, rolls)
+    rolls = np.where(valid, rolls, 0)
+    rolls = np.where(probs >= 1, 1, rolls)
+    return rolls.astype(np.int64)
@@ -1,73 +1,106 @@
 import openpyxl
-import re
+from openpyxl.utils import get_column_letter
+import pandas as pd
+import string
 
 
 class ExcelAutoFit:
-    RE_HAN = re.compile(r"[\u4e00-\u9fa5]")
     MIN_WIDTH = 6.0
     MAX_WIDTH = 80.0
 
-    # 生成列名字典，只是为了方便修改列宽时指定列，key:数字，从1开始；value:列名，从A开始
-    def get_num_colnum_dict(self):
+    # 一个数字或一个字母，列宽+=1.2；汉字+=2.0；其它+=1.0
+    # 用 str.translate 删除对应字符后比较长度，统计字符数
+    ALNUM_TABLE = dict.fromkeys(map(ord, string.ascii_letters + string.digits))
+    HAN_TABLE = dict.fromkeys(range(0x4E00, 0x9FA5 + 1))
+
+    @classmethod
+    def text_width(cls, text: str) -> float:
+        length = len(text)
+        alnum = length - len(text.translate(cls.ALNUM_TABLE))
+        han = length - len(text.translate(cls.HAN_TABLE))
+        return length + 0.2 * alnum + 1.0 * han
+
+    # 一组值中的最大列宽，相同的文本只计算一次
+    def values_width(self, values) -> float:
+        texts = set()
+        for value in values:
+            texts.add(str(value))
+        if not texts:
+            return 0.0
+        return max(self.text_width(text) for text in texts)
+
+    @staticmethod
+    def _is_missing(value) -> bool:
+        return (
+            value is None
+            or value is pd.NA
+            or (isinstance(value, float) and value != value)
+        )
+
+    def _clamp_width(self, width: float, max_width: float | None = None) -> float:
+        if not max_width:
+            max_width = self.MAX_WIDTH
+        if width < self.MIN_WIDTH:
+            return self.MIN_WIDTH
+        if width > max_width:
+            return max_width
+        return width
+
+    def compute_widths(
+        self,
+        df: pd.DataFrame,
+        index: bool = False,
+        sample_rows: int | None = None,
+    ) -> list[float]:
         """
-        :return: 返回字典：{1:'A', 2:'B', ...... , 52:'AZ'}
+        由 DataFrame 直接计算 to_excel 写入后各列的列宽，顺序与表格列一致。
+
+        :param index: 与 to_excel 的 index 参数一致
+        :param sample_rows: 行数超过该值时，只等间距抽取该数量的行计算
         """
-        num_str_dict = {}
-        A_Z = [chr(a) for a in range(ord("A"), ord("Z") + 1)]
-        AA_AZ = ["A" + chr(a) for a in range(ord("A"), ord("Z") + 1)]
-        A_AZ = A_Z + AA_AZ
-        for i in A_AZ:
-            num_str_dict[A_AZ.index(i) + 1] = i
-        return num_str_dict
+        if sample_rows and len(df) > sample_rows:
+            step = len(df) / sample_rows
+            df = df.iloc[[int(i * step) for i in range(sample_rows)]]
+
+        columns = []
+        if index:
+            names = [name or "" for name in df.index.names]
+            if df.index.nlevels == 1:
+                columns.append((names[0], df.index))
+            else:
+                for level, name in enumerate(names):
+                    columns.append((name, df.index.get_level_values(level)))
+        for i, name in enumerate(df.columns):
+            columns.append((name, df.iloc[:, i]))
+
+        widths = []
+        for name, values in columns:
+            # 缺失值写入为空单元格
+            values = [v for v in values if not self._is_missing(v)]
+            widths.append(max(self.text_width(str(name)), self.values_width(values)))
+        return widths
+
+    # 按 DataFrame 内容设置列宽，用于 to_excel 写入后
+    def fit_sheet(
+        self,
+        sheet,
+        df: pd.DataFrame,
+        index: bool = False,
+        max_width: float | None = None,
+        sample_rows: int | None = None,
+    ):
+        widths = self.compute_widths(df, index=index, sample_rows=sample_rows)
+        for i, width in enumerate(widths):
+            sheet.column_dimensions[get_column_letter(i + 1)].width = self._clamp_width(
+                width, max_width
+            )
 
     def style_sheet(self, sheet, max_width: float | None = None):
-        if not max_width:
-            max_width = self.MAX_WIDTH
-        # 获取最大行数与最大列数
-        max_column = sheet.max_column
-        max_row = sheet.max_row
-
-        # 将每一列，单元格列宽最大的列宽值存到字典里，key:列的序号从1开始(与字典num_str_dic中的key对应)；value:列宽的值
-        max_column_dict = {}
-
-        # 生成列名字典，只是为了方便修改列宽时指定列，key:数字，从1开始；value:列名，从A开始
-        num_str_dict = self.get_num_colnum_dict()
-
-        # 遍历全部列
-        for i in range(1, max_column + 1):
-            # 遍历每一列的全部行
-            for j in range(1, max_row + 1):
-                column = 0
-                # 获取j行i列的值
-                sheet_value = sheet.cell(row=j, column=i).value
-                # 通过列表生成式生成字符列表，将当前获取到的单元格的str值的每一个字符放在一个列表中（列表中一个元素是一个字符）
-                sheet_value_list = [k for k in str(sheet_value)]
-                # 遍历当前单元格的字符列表
-                for v in sheet_value_list:
-                    # 判定长度，一个数字或一个字母，单元格列宽+=1.1，其它+=2.2（长度可根据需要自行修改，经测试一个字母的列宽长度大概为1）
-                    vb = v.encode("utf-8")
-                    if vb.isdigit() or vb.isalpha():
-                        column += 1.2
-                    elif self.RE_HAN.search(v):
-                        column += 2.0
-                    else:
-                        column += 1.0
-                # 当前单元格列宽与字典中的对比，大于字典中的列宽值则将字典更新。如果字典没有这个key，抛出异常并将值添加到字典中
-                try:
-                    if column > max_column_dict[i]:
-                        max_column_dict[i] = column
-                except Exception as e:
-                    max_column_dict[i] = column
-        # 此时max_column_dict字典中已存有当前sheet的所有列的最大列宽值，直接遍历字典修改列宽
-        for key, value in max_column_dict.items():
-            if value < self.MIN_WIDTH:
-                value = self.MIN_WIDTH
-            elif value > max_width:
-                value = max_width
-            try:
-                sheet.column_dimensions[num_str_dict[key]].width = value
-            except Exception as e:
-                print(f"AutoFit error: {e}, key: {key}, value: {value}")
+        for i, column in enumerate(sheet.iter_cols(values_only=True)):
+            width = self.values_width(column)
+            sheet.column_dimensions[get_column_letter(i + 1)].width = self._clamp_width(
+                width, max_width
+            )
 
     def style_workbook(
         self, workbook: openpyxl.Workbook, max_width: float | None = None
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+import hashlib
+
+from openpyxl.drawing.image import Image
+from openpyxl.writer.excel import ExcelWriter
+from PIL import Image as PILImage
+
+
+class ImageMedia:
+    """
+    xlsx 中的一个媒体文件，内容相同的图片共用同一个媒体文件。
+    """
+
+    def __init__(self, data: bytes, format: str, size: tuple[int, int]):
+        self.data = data
+        self.format = format
+        self.size = size
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        self.path = f"/xl/media/image_{digest}.{format}"
+
+
+class SharedImage(Image):
+    """
+    引用 ImageMedia 的图片，可以在多个单元格中插入，媒体文件只保存一份。
+    """
+
+    def __init__(self, media: ImageMedia):
+        # 不调用父类构造，避免每个锚点都重新打开文件
+        self.media = media
+        self.ref = None
+        self.format = media.format
+        self.width, self.height = media.size
+
+    @property
+    def path(self):
+        return self.media.path
+
+    def _data(self):
+        return self.media.data
+
+
+# 文件路径 -> ImageMedia
+g_image_medias = {}
+
+
+def load_image_media(path: str) -> ImageMedia:
+    media = g_image_medias.get(path)
+    if media is not None:
+        return media
+    with open(path, "rb") as f:
+        data = f.read()
+    with PILImage.open(path) as img:
+        format = img.format.lower() if img.format else "png"
+        size = img.size
+    media = ImageMedia(data, format, size)
+    g_image_medias[path] = media
+    return media
+
+
+# 创建插入单元格用的图片，相同内容的图片只读取和保存一次
+def create_shared_image(
+    path: str, width: int | None = None, height: int | None = None
+) -> SharedImage:
+    img = SharedImage(load_image_media(path))
+    if width is not None:
+        img.width = width
+    if height is not None:
+        img.height = height
+    return img
+
+
+# openpyxl 按图片对象逐个写入媒体文件，改为同一路径只写入一次
+def _write_shared_images(self):
+    written = set()
+    for img in self._images:
+        path = img.path[1:]
+        if path in written:
+            continue
+        written.add(path)
+        self._archive.writestr(path, img._data())
+
+
+@contextmanager
+def shared_image_media():
+    """
+    在此范围内保存的工作簿，共用媒体文件的 SharedImage 只写入一份媒体文件。
+
+    openpyxl 的 Workbook.save 内部创建 ExcelWriter，无法替换为子类，
+    因此只在保存使用了 SharedImage 的工作簿时临时替换 ExcelWriter._write_images。
+    """
+    original = ExcelWriter._write_images
+    ExcelWriter._write_images = _write_shared_images
+    try:
+        yield
+    finally:
+        ExcelWriter._write_images = original
@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from library.excel_auto_fit import ExcelAutoFit
+from library.item_db import ItemDB, set_global_item_db
+from library.sheet_pipeline import SheetPipeline
+from library.streaming_writer import StreamingExcelWriter, set_column_widths
+from library.text_db import TextDB, get_global_text_db
+
+EXPORT_FORMATS = ("xlsx", "parquet", "arrow", "csv", "sqlite")
+# 多语言导出时默认同时运行的语言数，每种语言是一次完整的导出，内存占用较大
+MAX_LANG_JOBS = 4
+
+
+# 导出脚本的通用命令行参数
+def parse_export_args(description: str | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="使用 openpyxl write_only 模式逐行写入xlsx，降低内存占用",
+    )
+    parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        default="xlsx",
+        help="导出格式，非xlsx格式只导出数据，不做任何样式处理",
+    )
+    parser.add_argument(
+        "--langs",
+        type=int,
+        nargs="+",
+        help="导出指定语言（语言id），可指定多个，每种语言在一个子进程中导出，文件名添加语言id后缀",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=MAX_LANG_JOBS,
+        help="多语言导出时同时运行的子进程数",
+    )
+    args = parser.parse_args()
+    if args.langs:
+        run_multi_lang(args.langs, max_jobs=args.jobs)
+    return args
+
+
+# 多语言导出时当前进程导出的语言
+g_export_lang = None
+
+
+# Foo.xlsx -> Foo.<lang_id>.xlsx
+def get_lang_path(path: str, lang_id: int) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{lang_id}{ext}"
+
+
+# 导出文件的实际路径，多语言导出时添加语言id后缀
+def get_export_path(path: str) -> str:
+    if g_export_lang is None:
+        return path
+    return get_lang_path(path, g_export_lang)
+
+
+# 当前进程以 lang_id 导出，物品库直接从 natives 按该语言构建
+def set_export_lang(lang_id: int):
+    global g_export_lang
+    g_export_lang = lang_id
+    TextDB.set_global_default_lang(lang_id)
+    set_global_item_db(ItemDB.from_natives(get_global_text_db([lang_id])))
+
+
+def run_multi_lang(langs: list[int], max_jobs: int = MAX_LANG_JOBS):
+    """
+    每种语言各执行一次完整的导出，结果与以该语言为默认语言运行脚本完全一致。
+
+    表格构建过程中文本参与了连接、排序和字符串拼接（技能名、物品名、旋律等），
+    与语言无关的表格无法在之后替换文本得到相同的结果，因此不共享构建好的表格，
+    只共享 natives 的解析结果：第一种语言先单独导出，解析结果写入 __cache 缓存，
+    其余语言最多 max_jobs 个同时导出，直接读取缓存，不再解析 json。
+
+    只有一种语言时在当前进程导出；有多种语言时每种语言启动一个 `--langs <id>` 的子进程，
+    父进程不 fork，等待全部子进程结束后退出。
+    """
+    if len(langs) == 1:
+        set_export_lang(langs[0])
+        return
+
+    argv = _remove_langs_arg(sys.argv[1:])
+
+    def _export(lang_id: int) -> int:
+        command = [sys.executable, sys.argv[0], *argv, "--langs", str(lang_id)]
+        return subprocess.run(command).returncode
+
+    returncodes = {langs[0]: _export(langs[0])}
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as executor:
+        returncodes.update(zip(langs[1:], executor.map(_export, langs[1:])))
+
+    failed = [lang_id for lang_id, returncode in returncodes.items() if returncode != 0]
+    if failed:
+        print(f"Export failed for langs: {failed}")
+        sys.exit(1)
+    sys.exit(0)
+
+
+# 从命令行参数中移除 --langs 及其语言id
+def _remove_langs_arg(argv: list[str]) -> list[str]:
+    result = []
+    skipping = False
+    for arg in argv:
+        if arg == "--langs":
+            skipping = True
+            continue
+        if skipping and arg.isdigit():
+            continue
+        skipping = False
+        result.append(arg)
+    return result
+
+
+# 导出多张表到xlsx，自动列宽，并应用 pipeline 中的格式处理
+def export_excel(
+    path: str,
+    sheets: dict[str, pd.DataFrame],
+    pipeline: SheetPipeline | None = None,
+    streaming: bool = False,
+    index: bool = False,
+    max_width: float | None = None,
+    column_widths: dict[str, float] | None = None,
+):
+    if streaming:
+        with StreamingExcelWriter(path) as writer:
+            for sheet_name, df in sheets.items():
+                writer.write_sheet(
+                    df,
+                    sheet_name,
+                    index=index,
+                    pipeline=pipeline,
+                    max_width=max_width,
+                    column_widths=column_widths,
+                )
+        return
+
+    autofit = ExcelAutoFit()
+    with pd.ExcelWriter(path) as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=index)
+            sheet = writer.sheets[sheet_name]
+            autofit.fit_sheet(sheet, df, index=index, max_width=max_width)
+            if column_widths:
+                headers = list(df.columns)
+                if index:
+                    headers = [df.index.name] + headers
+                set_column_widths(sheet, headers, column_widths)
+        if pipeline is not None:
+            pipeline.run_workbook(writer.book)
+
+
+# 按 --format 导出多张表，xlsx 以外的格式忽略样式相关参数
+def export_tables(
+    path: str,
+    sheets: dict[str, pd.DataFrame],
+    fmt: str = "xlsx",
+    pipeline: SheetPipeline | None = None,
+    streaming: bool = False,
+    index: bool = False,
+    max_width: float | None = None,
+    column_widths: dict[str, float] | None = None,
+):
+    """
+    :param path: xlsx 文件名，其他格式据此生成输出路径：
+        parquet/arrow/csv 为同名目录下每张表一个文件，sqlite 为同名 .sqlite 文件，每张表一个 table
+        多语言导出时文件名添加语言id后缀，见 get_export_path
+    """
+    path = get_export_path(path)
+    if fmt == "xlsx":
+        export_excel(
+            path,
+            sheets,
+            pipeline=pipeline,
+            streaming=streaming,
+            index=index,
+            max_width=max_width,
+            column_widths=column_widths,
+        )
+        return
+
+    stem = os.path.splitext(path)[0]
+    if fmt == "sqlite":
+        export_sqlite(f"{stem}.sqlite", sheets, index=index)
+        return
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    os.makedirs(stem, exist_ok=True)
+    for sheet_name, df in sheets.items():
+        sheet_path = os.path.join(stem, f"{sheet_name}.{fmt}")
+        if fmt == "csv":
+            to_text_frame(df).to_csv(sheet_path, index=index, encoding="utf-8-sig")
+        else:
+            write_arrow_table(sheet_path, to_arrow_table(df, index=index), fmt)
+
+
+# 单元格转为文本格式可存储的值，list/dict 转为 JSON
+def to_text_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def to_text_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for name in df.columns[df.dtypes == object]:
+        df[name] = df[name].map(to_text_value)
+    return df
+
+
+# 每张表一个 table，已存在时覆盖
+def export_sqlite(path: str, sheets: dict[str, pd.DataFrame], index: bool = False):
+    with sqlite3.connect(path) as conn:
+        for sheet_name, df in sheets.items():
+            df = to_text_frame(df)
+            # sqlite 只支持基本类型，其余类型转为文本
+            for name in df.columns[df.dtypes == object]:
+                df[name] = df[name].map(
+                    lambda v: (
+                        v
+                        if v is None or isinstance(v, (str, int, float, bool))
+                        else str(v)
+                    )
+                )
+            df.to_sql(sheet_name, conn, if_exists="replace", index=index)
+    conn.close()
+
+
+def _is_missing(value) -> bool:
+    return (
+        value is None or value is pd.NA or (isinstance(value, float) and value != value)
+    )
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "parquet/arrow export requires pyarrow: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+# list 列保留为 arrow 的 list 类型；类型不一致无法转换的列转为文本
+def to_arrow_table(df: pd.DataFrame, index: bool = False):
+    pa = _import_pyarrow()
+    if index:
+        df = df.reset_index()
+    arrays = []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        try:
+            arrays.append(pa.array(column, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            texts = [None if _is_missing(v) else str(to_text_value(v)) for v in column]
+            arrays.append(pa.array(texts, type=pa.string()))
+    names = [str(name) for name in df.columns]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def write_arrow_table(path: str, table, fmt: str):
+    pa = _import_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
@@ -1,24 +1,107 @@
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from PIL import Image
 
+from library.user_data import get_file_hash
 
-TEMP_DIR = "__temp"
+CACHE_DIR = "__cache/images"
+# 缓存目录大小上限，超出时按最近使用时间淘汰
+CACHE_MAX_BYTES = 256 << 20
+# 编码逻辑变化时修改，使旧缓存失效
+ENCODE_VERSION = 1
 
+Size = tuple[int, int]
 
-# 压缩图像，返回压缩后的图像路径
-def compress_png(src_path: str, quality: int = 90) -> str:
+
+# 缓存文件名由 源文件内容hash + 编码参数 决定
+def get_compressed_path(
+    src_path: str, quality: int = 90, size: Size | None = None
+) -> str:
+    key = f"{get_file_hash(src_path)}:jpeg:{quality}:{size}:{ENCODE_VERSION}"
+    key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.jpg")
+
+
+def _encode_jpeg(src_path: str, dst_path: str, quality: int, size: Size | None):
     img = Image.open(src_path)
     # 创建一个白色底色的新图像
     white_bg = Image.new("RGB", img.size, (255, 255, 255))
     # 将 PNG 图像粘贴到白色背景上
     white_bg.paste(img, mask=img.split()[3])  # 使用 alpha 通道作为掩码
-    # 保存为 JPG 格式
-    src_file_name = os.path.basename(src_path)
-    dst_file_name = src_file_name.replace(".png", ".jpg")
-    dst_path = os.path.join(TEMP_DIR, dst_file_name)
-    if not os.path.exists(os.path.dirname(dst_path)):
-        os.makedirs(os.path.dirname(dst_path))
-
-    white_bg.save(dst_path, "JPEG", quality=quality)
+    # 缩放到显示尺寸
+    if size is not None and white_bg.size != size:
+        white_bg = white_bg.resize(size, Image.LANCZOS)
+    # 保存为 JPG 格式，先写入临时文件，避免并发时读到不完整的文件
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = f"{dst_path}.{os.getpid()}.{id(white_bg)}.tmp"
+    white_bg.save(tmp_path, "JPEG", quality=quality)
+    os.replace(tmp_path, dst_path)
+
+
+# 压缩图像，返回压缩后的图像路径；内容未变化的图像直接返回缓存
+# size 为 (宽, 高)，指定时缩放到该尺寸
+def compress_png(src_path: str, quality: int = 90, size: Size | None = None) -> str:
+    dst_path = get_compressed_path(src_path, quality, size)
+    if os.path.exists(dst_path):
+        # 更新时间戳，用于淘汰最久未使用的缓存
+        os.utime(dst_path)
+        return dst_path
+
+    _encode_jpeg(src_path, dst_path, quality, size)
     return dst_path
+
+
+# 批量压缩图像，返回 源路径 -> 压缩后路径，失败的图像不包含在结果中
+def compress_png_batch(
+    src_paths: list[str],
+    quality: int = 90,
+    size: Size | None = None,
+    max_workers: int | None = None,
+    use_processes: bool = False,
+) -> dict[str, str]:
+    src_paths = list(dict.fromkeys(src_paths))
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    results = {}
+    with executor_cls(max_workers=max_workers) as executor:
+        futures = {
+            src_path: executor.submit(compress_png, src_path, quality, size)
+            for src_path in src_paths
+        }
+        for src_path, future in futures.items():
+            try:
+                results[src_path] = future.result()
+            except Exception as e:
+                print(f"Error compressing {src_path}: {e}")
+
+    evict_image_cache()
+    return results
+
+
+# 缓存超出大小上限时，删除最久未使用的文件
+def evict_image_cache(max_bytes: int = CACHE_MAX_BYTES):
+    if not os.path.exists(CACHE_DIR):
+        return
+    entries = []
+    total = 0
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total += stat.st_size
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+if __name__ == "__main__":
+    evict_image_cache()
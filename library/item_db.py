@@ -2,9 +2,14 @@ from dataclasses import dataclass
 import json
 import re
 
+from library.utils import is_guid_like, remove_enum_value
+from library.user_data import load_user_data
+
 re_item_id = re.compile(r"\[[-\d]+\]ITEM_(\d+)")
 g_item_db = None
 
+ITEM_DATA_PATH = "natives/STM/GameDesign/Common/Item/itemData.user.3.json"
+
 
 @dataclass
 class ItemEntry:
@@ -15,15 +20,26 @@ class ItemEntry:
 
 
 class ItemDB:
-    def __init__(self, path):
+    def __init__(self, path: str | None = None):
         self.items = {}
+        if path is None:
+            return
 
         data = None
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
         if not data:
             raise ValueError("Invalid ItemDB data")
+        self._add_items(data)
+
+    # 直接从 natives 中的 itemData 和文本库构建，不依赖 item_db.json
+    @classmethod
+    def from_natives(cls, text_db, path: str = ITEM_DATA_PATH) -> "ItemDB":
+        item_db = cls()
+        item_db._add_items(dump_item_rows(path, text_db))
+        return item_db
 
+    def _add_items(self, data: list[dict]):
         for item in data:
             self.items[item["_ItemId"]] = ItemEntry(
                 item["_Index"],
@@ -40,6 +56,36 @@ class ItemDB:
             return self.items.get(f"ITEM_{match.group(1)}")
 
 
+# 读取 itemData，GUID替换为文本，即 item_db.json 的内容
+def dump_item_rows(path: str, text_db) -> list[dict[str, str]]:
+    content = load_user_data(path)
+
+    item_db = []
+    for cData in content[0]["app.user_data.ItemData"]["_Values"]:
+        cData = cData["app.user_data.ItemData.cData"]
+
+        entry = {}
+        for col_name, col_data in cData.items():
+            if is_guid_like(str(col_data)):
+                text = text_db.get_text_by_guid(col_data)
+                if text:
+                    text = text.replace("\n", "").replace("\r", "")
+                    col_data = text
+                else:
+                    col_data = ""
+            else:
+                col_data = remove_enum_value(col_data)
+            entry[col_name] = col_data
+        item_db.append(entry)
+
+    return item_db
+
+
+def set_global_item_db(db: ItemDB):
+    global g_item_db
+    g_item_db = db
+
+
 def get_global_item_db():
     global g_item_db
     if not g_item_db:
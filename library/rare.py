@@ -2,6 +2,7 @@ import re
 import openpyxl
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Color
+from library.sheet_pipeline import SheetPipeline
 from library.utils import rare_enum_to_value
 
 RARE_COLORS = {
@@ -63,26 +64,37 @@ def _apply_opacity(color, opacity):
     return f"{mixed_r:02X}{mixed_g:02X}{mixed_b:02X}"
 
 
+# 每个RARE等级的字体和填充只创建一次，所有单元格共享
+g_rare_styles = {}
+
+
+def _get_rare_style(rare: int) -> tuple[Font, PatternFill]:
+    style = g_rare_styles.get(rare)
+    if style is None:
+        color = RARE_COLORS[rare]
+        color = _apply_opacity(color, 0.5)
+        brightness = _get_brightness(Color(color))
+        text_color = _get_text_color(brightness)
+        fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        style = g_rare_styles[rare] = (text_color, fill)
+    return style
+
+
+# SheetPipeline 单元格处理：RARE着色，并转换为数值
+def fix_rare_color_cell(cell, header=None):
+    if not isinstance(cell.value, str):
+        return
+    match = re_rare.search(cell.value)
+    if match:
+        cell.font, cell.fill = _get_rare_style(int(match.group(1)))
+        cell.value = rare_enum_to_value(cell.value)
+
+
+# SheetPipeline 单元格处理：只将RARE转换为数值
+def fix_rare_value_cell(cell, header=None):
+    if isinstance(cell.value, str):
+        cell.value = rare_enum_to_value(cell.value)
+
+
 def apply_fix_rare_colors(wb: Workbook):
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        max_column = ws.max_column
-        max_row = ws.max_row
-        for i in range(max_row):
-            for j in range(max_column):
-                cell = ws.cell(row=i + 1, column=j + 1)
-                if cell.value is not None and isinstance(cell.value, str):
-                    match = re_rare.search(cell.value)
-                    if match:
-                        color = RARE_COLORS[int(match.group(1))]
-                        color = _apply_opacity(color, 0.5)
-                        brightness = _get_brightness(Color(color))
-                        text_color = _get_text_color(brightness)
-                        cell.font = text_color
-                        cell.fill = PatternFill(
-                            start_color=color, end_color=color, fill_type="solid"
-                        )
-                        cell.value = rare_enum_to_value(cell.value)
-        # cell = ws.cell(row=i+1, column=1, value=f"Background: {color}")
-        # fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-        # cell.fill = fill
+    SheetPipeline().add_cell_pass(fix_rare_color_cell).run_workbook(wb)
@@ -0,0 +1,100 @@
+from typing import Callable
+
+import openpyxl
+from openpyxl.styles import Alignment
+
+# 单元格处理函数：fn(cell, header)，header 为该列首行的值
+CellPass = Callable[[object, object], None]
+# 列筛选：列名集合，或 fn(header) -> bool
+ColumnFilter = set | Callable[[object], bool]
+
+ALIGN_WRAP = Alignment(wrap_text=True)
+
+
+class SheetPipeline:
+    """
+    工作表后处理流水线。
+
+    注册的单元格处理在一次遍历中按注册顺序对每个单元格执行，
+    避免每种处理各自遍历一遍整张表。
+    列处理只作用于表头匹配的列，按列逐列执行，不遍历其他列的单元格。
+    """
+
+    def __init__(self):
+        self._cell_passes = []
+        self._column_passes = []
+
+    # 对 min_row 行及之后的每个单元格执行
+    def add_cell_pass(self, func: CellPass, min_row: int = 1) -> "SheetPipeline":
+        self._cell_passes.append((func, min_row))
+        return self
+
+    # 对表头匹配 columns 的列中 min_row 行及之后的单元格执行
+    def add_column_pass(
+        self, func: CellPass, columns: ColumnFilter, min_row: int = 1
+    ) -> "SheetPipeline":
+        if not callable(columns):
+            columns = set(columns).__contains__
+        self._column_passes.append((func, columns, min_row))
+        return self
+
+    # 第 row_idx 行需要执行的单元格处理
+    def get_cell_passes(self, row_idx: int) -> list[CellPass]:
+        return [func for func, min_row in self._cell_passes if row_idx >= min_row]
+
+    # 各列需要执行的列处理：{列序号(从1开始): [(func, min_row), ...]}
+    def get_column_passes(self, headers: list) -> dict[int, list]:
+        result = {}
+        for col_idx, header in enumerate(headers, 1):
+            passes = [
+                (func, min_row)
+                for func, columns, min_row in self._column_passes
+                if columns(header)
+            ]
+            if passes:
+                result[col_idx] = passes
+        return result
+
+    def run_sheet(self, sheet):
+        if self._cell_passes:
+            headers = [cell.value for cell in sheet[1]] if sheet.max_row > 0 else []
+            for row in sheet.iter_rows():
+                passes = self.get_cell_passes(row[0].row)
+                if not passes:
+                    continue
+                for cell, header in zip(row, headers):
+                    for func in passes:
+                        func(cell, header)
+        if self._column_passes:
+            headers = [cell.value for cell in sheet[1]] if sheet.max_row > 0 else []
+            for col_idx, passes in self.get_column_passes(headers).items():
+                header = headers[col_idx - 1]
+                for func, min_row in passes:
+                    for (cell,) in sheet.iter_rows(
+                        min_row=min_row, min_col=col_idx, max_col=col_idx
+                    ):
+                        func(cell, header)
+
+    def run_workbook(self, workbook: openpyxl.Workbook):
+        for sheet_name in workbook.sheetnames:
+            self.run_sheet(workbook[sheet_name])
+
+
+# 为文本单元格添加自动换行，通常作为列处理注册，不含首行时 min_row=2
+def wrap_text_pass(cell, header):
+    if isinstance(cell.value, str):
+        cell.alignment = ALIGN_WRAP
+
+
+# 为所有单元格添加自动换行
+def wrap_all_pass(cell, header):
+    cell.alignment = ALIGN_WRAP
+
+
+# 为数字单元格设置数字格式，如 "0.000%"，通常作为列处理注册
+def number_format_pass(number_format: str) -> CellPass:
+    def _format(cell, header):
+        if isinstance(cell.value, (int, float)):
+            cell.number_format = number_format
+
+    return _format
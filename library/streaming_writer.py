@@ -0,0 +1,114 @@
+import itertools
+import math
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+from library.excel_auto_fit import ExcelAutoFit
+from library.sheet_pipeline import SheetPipeline
+
+
+# 与 pandas to_excel 一致的单元格值转换
+def to_excel_value(value):
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isnan(value):
+            return None
+        if math.isinf(value):
+            return "inf" if value > 0 else "-inf"
+        return value
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+# 按列名设置列宽，headers 为表格各列的列名
+def set_column_widths(sheet, headers: list, column_widths: dict[str, float]):
+    for name, width in column_widths.items():
+        if name in headers:
+            col_letter = get_column_letter(headers.index(name) + 1)
+            sheet.column_dimensions[col_letter].width = width
+
+
+class StreamingExcelWriter:
+    """
+    基于 openpyxl write_only 模式的流式写入。
+
+    每行在写入时即应用 SheetPipeline 中的单元格处理和列处理，写完的行不再保留在内存中。
+    列宽等列级别设置必须在写入行之前确定，因此由 DataFrame 预先计算。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.book = openpyxl.Workbook(write_only=True)
+        self.sheets = {}
+        self._autofit = ExcelAutoFit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write_sheet(
+        self,
+        df: pd.DataFrame,
+        sheet_name: str,
+        index: bool = False,
+        pipeline: SheetPipeline | None = None,
+        max_width: float | None = None,
+        column_widths: dict[str, float] | None = None,
+        sample_rows: int | None = None,
+    ):
+        sheet = self.book.create_sheet(sheet_name)
+        self.sheets[sheet_name] = sheet
+
+        headers = list(df.columns)
+        if index:
+            headers = [df.index.name] + headers
+        # 列宽需要在写入第一行前设置
+        self._autofit.fit_sheet(
+            sheet, df, index=index, max_width=max_width, sample_rows=sample_rows
+        )
+        if column_widths:
+            set_column_widths(sheet, headers, column_widths)
+
+        column_passes = pipeline.get_column_passes(headers) if pipeline else {}
+        rows = itertools.chain([headers], df.itertuples(index=index, name=None))
+        for row_idx, values in enumerate(rows, 1):
+            passes = pipeline.get_cell_passes(row_idx) if pipeline else []
+            if not passes and not column_passes:
+                sheet.append([to_excel_value(v) for v in values])
+                continue
+            cells = []
+            for col_idx, (value, header) in enumerate(zip(values, headers), 1):
+                col_passes = [
+                    func
+                    for func, min_row in column_passes.get(col_idx, [])
+                    if row_idx >= min_row
+                ]
+                if not passes and not col_passes:
+                    cells.append(to_excel_value(value))
+                    continue
+                cell = WriteOnlyCell(sheet, value=to_excel_value(value))
+                cell.row = row_idx
+                cell.column = col_idx
+                for func in passes:
+                    func(cell, header)
+                for func in col_passes:
+                    func(cell, header)
+                cells.append(cell)
+            sheet.append(cells)
+
+    def close(self):
+        self.book.save(self.path)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+from library.user_data import load_user_data
+from library.utils import create_lookup_dict, minify_nested_serial, remove_enum_value
+
+
+@dataclass
+class TableSpec:
+    """
+    user.3 数据转换为 DataFrame 的声明式描述。
+
+    每个单元格依次经过：展开嵌套 -> 移除枚举前缀 -> value_map 替换 -> columns 中的列处理，
+    整表生成后再经过 post 中的处理（如批量处理GUID）。
+    """
+
+    # 主类型名，如 app.user_data.ItemData
+    type_name: str
+    minify: bool = True
+    unwrap_keys: tuple[str, ...] = ("_Value",)
+    remove_enum: bool = True
+    # 标量值的整体替换，如 {"INVALID": ""}
+    value_map: dict = field(default_factory=dict)
+    # 列名（已去除前缀 _）-> 单元格处理函数
+    columns: dict[str, Callable] = field(default_factory=dict)
+    exclude: set[str] = field(default_factory=set)
+    post: list[Callable[[pd.DataFrame], pd.DataFrame]] = field(default_factory=list)
+
+    def compile(self) -> "TableConverter":
+        return TableConverter(self)
+
+
+# 引用其他表：将值替换为参考表中对应的值，找不到时保留原值
+# 值为 list 时逐个替换
+def lookup(ref_df: pd.DataFrame, key_column: str, value_column: str) -> Callable:
+    table = create_lookup_dict(ref_df, key_column, value_column)
+
+    def _lookup(value):
+        if isinstance(value, list):
+            return [_lookup(v) for v in value]
+        try:
+            return table.get(value, value)
+        except TypeError:
+            return value
+
+    return _lookup
+
+
+class TableConverter:
+    """
+    由 TableSpec 编译而来的转换器。
+
+    每种 cData 键结构只生成一次列计划，按列收集数据后一次性构建 DataFrame。
+    """
+
+    def __init__(self, spec: TableSpec):
+        self.spec = spec
+        self._cdata_type = f"{spec.type_name}.cData"
+        self._plans = {}
+
+    def _get_cell_steps(self, name: str) -> list[Callable]:
+        spec = self.spec
+        steps = []
+        if spec.minify:
+            unwrap_keys = spec.unwrap_keys
+            steps.append(lambda value: minify_nested_serial(value, unwrap_keys))
+        if spec.remove_enum:
+            steps.append(remove_enum_value)
+        if spec.value_map:
+            value_map = spec.value_map
+
+            def _map_value(value):
+                if isinstance(value, (list, dict)):
+                    return value
+                return value_map.get(value, value)
+
+            steps.append(_map_value)
+        if name in spec.columns:
+            steps.append(spec.columns[name])
+        return steps
+
+    # 返回 [(列名, [(原键, 处理函数列表)])]，同名列以后出现的键为准，位置以首次出现为准
+    def _get_plan(self, keys: tuple[str, ...]) -> list[tuple[str, str, list]]:
+        plan = self._plans.get(keys)
+        if plan is not None:
+            return plan
+        sources = {}
+        for key in keys:
+            name = key[1:] if key.startswith("_") else key
+            if name in self.spec.exclude:
+                continue
+            sources[name] = key
+        plan = [
+            (name, key, self._get_cell_steps(name)) for name, key in sources.items()
+        ]
+        self._plans[keys] = plan
+        return plan
+
+    def convert(self, data: list) -> pd.DataFrame:
+        columns = {}
+        row_count = 0
+        for cData in data[0][self.spec.type_name]["_Values"]:
+            cData = cData[self._cdata_type]
+            for name, key, steps in self._get_plan(tuple(cData)):
+                value = cData[key]
+                for step in steps:
+                    value = step(value)
+                column = columns.get(name)
+                if column is None:
+                    # 新出现的列，之前的行补缺失值
+                    column = columns[name] = [float("nan")] * row_count
+                elif len(column) < row_count:
+                    column.extend([float("nan")] * (row_count - len(column)))
+                column.append(value)
+            row_count += 1
+        for column in columns.values():
+            if len(column) < row_count:
+                column.extend([float("nan")] * (row_count - len(column)))
+
+        df = pd.DataFrame(columns)
+        for post in self.spec.post:
+            df = post(df)
+        return df
+
+    def dump(self, path: str) -> pd.DataFrame:
+        return self.convert(load_user_data(path))
+
+
+def dump_table(path: str, spec: TableSpec) -> pd.DataFrame:
+    return spec.compile().dump(path)
@@ -1,6 +1,13 @@
 from dataclasses import dataclass
 import json
+import mmap
+import os
 import re
+import struct
+
+import pandas as pd
+
+from library.utils import is_guid_like
 
 re_xref_id = re.compile(r"<REF (.*?)>")
 re_xref_em_id = re.compile(r"<EMID (.*?)>")
@@ -8,6 +15,18 @@ re_xref_em_id = re.compile(r"<EMID (.*?)>")
 g_default_lang = 13
 g_text_db = None
 
+# 编译后的二进制文本库格式
+BIN_MAGIC = b"MHTD"
+BIN_VERSION = 1
+# magic, version, entry_count, 之后为各段的偏移:
+# names, guids, belongs_to_index, belongs_to_table, guid_index, name_index, langs
+BIN_HEADER = struct.Struct("<4sII7Q")
+
+
+# 去除换行符，读取文本时才处理
+def normalize_text(text: str) -> str:
+    return text.replace("\n", "").replace("\r", "")
+
 
 @dataclass
 class DBEntry:
@@ -19,25 +38,35 @@ class DBEntry:
     def get_text(self, lang_id: int | None = None) -> str:
         if lang_id is None:
             lang_id = g_default_lang
-        return self.contents.get(str(lang_id))
+        lang_key = str(lang_id)
+        text = self.contents.get(lang_key)
+        if text and ("\n" in text or "\r" in text):
+            text = normalize_text(text)
+            self.contents[lang_key] = text
+        return text
+
+    def normalize(self):
+        for lang_id, text in self.contents.items():
+            if "\n" in text or "\r" in text:
+                self.contents[lang_id] = normalize_text(text)
 
 
 class TextDB:
-    def __init__(self, entries: dict[str, DBEntry]):
+    def __init__(self, entries: dict[str, DBEntry], langs: set[str] | None = None):
         self.db_entries = entries
         self.index_name = {}
         self.default_lang = None
+        # 已加载的语言，None 表示全部
+        self.langs = langs
         self._create_index_name()
-        self._filter_data()
 
     def _create_index_name(self):
         for guid, entry in self.db_entries.items():
             self.index_name[entry.name] = guid
 
-    def _filter_data(self):
-        for entry in self.db_entries.values():
-            for lang_id, text in entry.contents.items():
-                entry.contents[lang_id] = text.replace("\n", "").replace("\r", "")
+    def _check_lang(self, lang_id: int):
+        if self.langs is not None and str(lang_id) not in self.langs:
+            raise ValueError(f"Language {lang_id} is not loaded in this TextDB")
 
     def _get_default_lang(self):
         if self.default_lang is not None:
@@ -45,52 +74,401 @@ class TextDB:
         return g_default_lang
 
     def set_default_lang(self, lang_id: int):
+        self._check_lang(lang_id)
         self.default_lang = lang_id
 
+    def has_langs(self, langs) -> bool:
+        if self.langs is None:
+            return True
+        return all(str(lang_id) in self.langs for lang_id in langs)
+
     def get_entry_by_name(self, name: str) -> DBEntry:
         guid = self.index_name.get(name)
         if guid is None:
             return None
-        return self.db_entries.get(guid)
+        return self.get_entry_by_guid(guid)
 
     def get_entry_by_guid(self, guid: str) -> DBEntry:
-        return self.db_entries.get(guid)
+        entry = self.db_entries.get(guid)
+        if entry is not None:
+            entry.normalize()
+        return entry
 
     def get_text_by_guid(self, guid: str, lang_id: int | None = None) -> str:
         if lang_id is None:
             lang_id = self._get_default_lang()
+        self._check_lang(lang_id)
         entry = self.db_entries.get(guid)
         if entry is None:
             return None
-        return entry.contents.get(str(lang_id))
+        return entry.get_text(lang_id)
 
     def get_text_by_name(self, name: str, lang_id: int | None = None) -> str:
-        entry = self.get_entry_by_name(name)
-        if entry is None:
+        guid = self.index_name.get(name)
+        if guid is None:
             return None
-        return self.get_text_by_guid(entry.guid, lang_id)
+        return self.get_text_by_guid(guid, lang_id)
 
+    def get_texts_by_guids(
+        self,
+        values,
+        lang_id: int | None = None,
+        keep_missing: bool = False,
+    ) -> pd.Series | list:
+        """
+        批量将GUID值替换为文本，非GUID值保持不变。
+
+        :param values: pd.Series 或任意可迭代对象
+        :param keep_missing: 找不到文本时保留GUID原值，否则替换为空字符串
+        :return: 输入为 pd.Series 时返回相同索引的 Series，否则返回 list
+        """
+        if lang_id is None:
+            lang_id = self._get_default_lang()
+        self._check_lang(lang_id)
+
+        if isinstance(values, pd.Series):
+            # 数值、布尔列不可能包含GUID
+            if values.dtype != object and not pd.api.types.is_string_dtype(values):
+                return values
+            items = values.tolist()
+        else:
+            items = list(values)
+
+        # 每个不同的字符串只检测、查询一次
+        resolved = {}
+        for value in items:
+            if not isinstance(value, str) or value in resolved:
+                continue
+            if len(value) < 36 or value[8] != "-" or not is_guid_like(value):
+                resolved[value] = value
+                continue
+            text = self.get_text_by_guid(value, lang_id)
+            if text:
+                resolved[value] = text
+            else:
+                resolved[value] = value if keep_missing else ""
+
+        results = [
+            resolved[value] if isinstance(value, str) else value for value in items
+        ]
+        if isinstance(values, pd.Series):
+            return pd.Series(
+                results, index=values.index, name=values.name, dtype=object
+            )
+        return results
+
+    # 对 DataFrame 的所有（或指定）列批量替换GUID
+    def resolve_guid_columns(
+        self,
+        df: pd.DataFrame,
+        columns: list[str] | None = None,
+        lang_id: int | None = None,
+        keep_missing: bool = False,
+    ) -> pd.DataFrame:
+        if columns is None:
+            columns = df.columns
+        for col in columns:
+            series = df[col]
+            resolved = self.get_texts_by_guids(
+                series, lang_id=lang_id, keep_missing=keep_missing
+            )
+            if resolved is not series:
+                df[col] = resolved
+        return df
+
+    @staticmethod
     def set_global_default_lang(lang_id: int):
         global g_default_lang
         g_default_lang = lang_id
 
 
+class _StringTable:
+    """
+    二进制文本库中的字符串表：u32 count, (count+1) x u64 offsets, utf-8 blob
+    """
+
+    def __init__(self, buf, offset: int):
+        self._buf = buf
+        (self.count,) = struct.unpack_from("<I", buf, offset)
+        self._offsets_pos = offset + 4
+        self._blob_pos = self._offsets_pos + (self.count + 1) * 8
+
+    def get_bytes(self, index: int) -> bytes:
+        start, end = struct.unpack_from("<2Q", self._buf, self._offsets_pos + index * 8)
+        return self._buf[self._blob_pos + start : self._blob_pos + end]
+
+    def get(self, index: int) -> str:
+        return self.get_bytes(index).decode("utf-8")
+
+
+def _write_string_table(f, strings: list[str]):
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    f.write(struct.pack("<I", len(blobs)))
+    f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+    for blob in blobs:
+        f.write(blob)
+
+
+def _write_u32_array(f, values: list[int]):
+    f.write(struct.pack(f"<{len(values)}I", *values))
+
+
+class MappedTextDB(TextDB):
+    """
+    基于内存映射的二进制文本库，打开时不解析数据，仅在查询时解码对应字符串。
+
+    与 TextDB 接口一致，由 compile_text_db 生成。
+    """
+
+    def __init__(self, path: str, langs: set[str] | None = None):
+        self.default_lang = None
+        self.langs = langs
+        # mmap 持有自己的文件描述符，映射后即可关闭文件
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = BIN_HEADER.unpack_from(self._buf, 0)
+        magic, version, self._entry_count = header[:3]
+        if magic != BIN_MAGIC or version != BIN_VERSION:
+            raise ValueError(f"Invalid text db binary: {path}")
+        (
+            names_pos,
+            guids_pos,
+            belongs_to_index_pos,
+            belongs_to_pos,
+            guid_index_pos,
+            name_index_pos,
+            langs_pos,
+        ) = header[3:]
+
+        self._names = _StringTable(self._buf, names_pos)
+        self._guids = _StringTable(self._buf, guids_pos)
+        self._belongs_to_index_pos = belongs_to_index_pos
+        self._belongs_to = _StringTable(self._buf, belongs_to_pos)
+        self._guid_index_pos = guid_index_pos
+        self._name_index_pos = name_index_pos
+        self._name_index_count = struct.unpack_from("<I", self._buf, name_index_pos)[0]
+
+        self._langs = {}
+        (lang_count,) = struct.unpack_from("<I", self._buf, langs_pos)
+        for i in range(lang_count):
+            lang_id, table_pos = struct.unpack_from(
+                "<IQ", self._buf, langs_pos + 4 + i * 12
+            )
+            if langs is not None and str(lang_id) not in langs:
+                continue
+            self._langs[lang_id] = _StringTable(self._buf, table_pos)
+
+    def close(self):
+        self._buf.close()
+
+    # 在排序索引中二分查找，返回条目序号
+    def _search(self, index_pos: int, count: int, table: _StringTable, key: str):
+        key = key.encode("utf-8")
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (entry_idx,) = struct.unpack_from("<I", self._buf, index_pos + 4 + mid * 4)
+            mid_key = table.get_bytes(entry_idx)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return entry_idx
+        return None
+
+    def _find_guid(self, guid: str) -> int | None:
+        if not isinstance(guid, str):
+            return None
+        return self._search(self._guid_index_pos, self._entry_count, self._guids, guid)
+
+    def _find_name(self, name: str) -> int | None:
+        if not isinstance(name, str):
+            return None
+        return self._search(
+            self._name_index_pos, self._name_index_count, self._names, name
+        )
+
+    def _get_text(self, entry_idx: int, lang_id: int) -> str | None:
+        table = self._langs.get(int(lang_id))
+        if table is None:
+            return None
+        text = table.get(entry_idx)
+        if not text:
+            return None
+        return normalize_text(text)
+
+    def _get_entry(self, entry_idx: int | None) -> DBEntry | None:
+        if entry_idx is None:
+            return None
+        contents = {}
+        for lang_id in self._langs:
+            text = self._get_text(entry_idx, lang_id)
+            if text is not None:
+                contents[str(lang_id)] = text
+        (belongs_to_idx,) = struct.unpack_from(
+            "<I", self._buf, self._belongs_to_index_pos + entry_idx * 4
+        )
+        return DBEntry(
+            name=self._names.get(entry_idx),
+            guid=self._guids.get(entry_idx),
+            belongs_to=self._belongs_to.get(belongs_to_idx),
+            contents=contents,
+        )
+
+    def get_entry_by_name(self, name: str) -> DBEntry:
+        return self._get_entry(self._find_name(name))
+
+    def get_entry_by_guid(self, guid: str) -> DBEntry:
+        return self._get_entry(self._find_guid(guid))
+
+    def get_text_by_guid(self, guid: str, lang_id: int | None = None) -> str:
+        if lang_id is None:
+            lang_id = self._get_default_lang()
+        self._check_lang(lang_id)
+        entry_idx = self._find_guid(guid)
+        if entry_idx is None:
+            return None
+        return self._get_text(entry_idx, lang_id)
+
+    def get_text_by_name(self, name: str, lang_id: int | None = None) -> str:
+        if lang_id is None:
+            lang_id = self._get_default_lang()
+        self._check_lang(lang_id)
+        entry_idx = self._find_name(name)
+        if entry_idx is None:
+            return None
+        return self._get_text(entry_idx, lang_id)
+
+
+# 将 texts_db.json 格式的条目列表编译为二进制文本库
+def write_text_db_bin(db_json: list[dict], bin_path: str):
+    entries = {}
+    for entry in db_json:
+        if not entry:
+            continue
+        entries[entry["guid"]] = entry
+    entries = list(entries.values())
+
+    lang_ids = set()
+    for entry in entries:
+        lang_ids.update(int(lang_id) for lang_id in entry["contents"])
+    lang_ids = sorted(lang_ids)
+
+    belongs_to_table = {}
+    for entry in entries:
+        belongs_to_table.setdefault(entry["belongs_to"], len(belongs_to_table))
+
+    # 同名条目以最后出现的为准，与 TextDB.index_name 一致
+    name_to_idx = {}
+    for i, entry in enumerate(entries):
+        name_to_idx[entry["name"]] = i
+    guid_index = sorted(
+        range(len(entries)), key=lambda i: entries[i]["guid"].encode("utf-8")
+    )
+    name_index = sorted(
+        name_to_idx.values(), key=lambda i: entries[i]["name"].encode("utf-8")
+    )
+
+    tmp_path = bin_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * BIN_HEADER.size)
+        offsets = []
+
+        offsets.append(f.tell())
+        _write_string_table(f, [entry["name"] for entry in entries])
+        offsets.append(f.tell())
+        _write_string_table(f, [entry["guid"] for entry in entries])
+        offsets.append(f.tell())
+        _write_u32_array(
+            f, [belongs_to_table[entry["belongs_to"]] for entry in entries]
+        )
+        offsets.append(f.tell())
+        _write_string_table(f, list(belongs_to_table.keys()))
+        offsets.append(f.tell())
+        _write_u32_array(f, [len(guid_index)] + guid_index)
+        offsets.append(f.tell())
+        _write_u32_array(f, [len(name_index)] + name_index)
+
+        lang_table_pos = []
+        for lang_id in lang_ids:
+            lang_table_pos.append(f.tell())
+            _write_string_table(
+                f,
+                [
+                    entry["contents"].get(str(lang_id))
+                    or entry["contents"].get(lang_id)
+                    or ""
+                    for entry in entries
+                ],
+            )
+        offsets.append(f.tell())
+        f.write(struct.pack("<I", len(lang_ids)))
+        for lang_id, pos in zip(lang_ids, lang_table_pos):
+            f.write(struct.pack("<IQ", lang_id, pos))
+
+        f.seek(0)
+        f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_VERSION, len(entries), *offsets))
+    os.replace(tmp_path, bin_path)
+
+
+def compile_text_db(db_json_path: str, bin_path: str):
+    with open(db_json_path, "r", encoding="utf-8") as f:
+        db_json = json.load(f)
+    write_text_db_bin(db_json, bin_path)
+
+
 def set_global_text_db(db: TextDB):
     global g_text_db
     g_text_db = db
 
 
-def get_global_text_db() -> TextDB:
+# langs 为需要的语言，已加载的全局文本库不包含时会按并集重新加载
+def get_global_text_db(langs=None) -> TextDB:
     global g_text_db
     if g_text_db is None:
-        g_text_db = load_text_db("texts_db.json")
+        g_text_db = load_text_db(get_text_db_path(), langs=langs)
+    elif langs is not None and not g_text_db.has_langs(langs):
+        langs = set(langs) | {int(lang_id) for lang_id in g_text_db.langs}
+        # 不关闭旧的文本库：已缓存的对象（如 ToneParser）可能仍在使用，
+        # 其文件映射在没有引用后由 GC 释放
+        g_text_db = load_text_db(get_text_db_path(), langs=langs)
     return g_text_db
 
 
-def load_text_db(db_json_path: str) -> TextDB:
+# 优先使用不早于 texts_db.json 的已编译二进制文本库
+def get_text_db_path(
+    json_path: str = "texts_db.json", bin_path: str = "texts_db.bin"
+) -> str:
+    if os.path.exists(bin_path):
+        if not os.path.exists(json_path) or os.path.getmtime(
+            bin_path
+        ) >= os.path.getmtime(json_path):
+            return bin_path
+    return json_path
+
+
+# langs 指定只加载的语言id，None 表示加载全部语言
+def load_text_db(db_json_path: str, langs=None) -> TextDB:
+    if langs is not None:
+        langs = {str(lang_id) for lang_id in langs}
+    if db_json_path.endswith(".bin"):
+        return MappedTextDB(db_json_path, langs=langs)
+
+    # 解析时即丢弃不需要的语言，避免全部语言同时驻留内存
+    def _project_contents(obj: dict) -> dict:
+        if langs is not None and "contents" in obj and "guid" in obj:
+            contents = obj["contents"]
+            obj["contents"] = {k: v for k, v in contents.items() if k in langs}
+        return obj
+
     db_json = []
     with open(db_json_path, "r", encoding="utf-8") as f:
-        db_json = json.load(f)
+        db_json = json.load(f, object_hook=_project_contents)
 
     db_entries = {}
     for i, entry in enumerate(db_json):
@@ -104,7 +482,7 @@ def load_text_db(db_json_path: str) -> TextDB:
         )
         db_entries[db_entry.guid] = db_entry
 
-    return TextDB(db_entries)
+    return TextDB(db_entries, langs=langs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import Callable
+
+CACHE_DIR = "__cache/natives"
+DERIVED_CACHE_DIR = "__cache/derived"
+CACHE_VERSION = 1
+
+# 进程内的文件hash缓存 path -> (mtime_ns, size, sha1)
+g_file_hashes = {}
+# 本进程是否已清理过源文件已删除的缓存
+g_cache_evicted = False
+
+
+def get_file_hash(path: str) -> str:
+    stat = os.stat(path)
+    cached = g_file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    file_hash = sha1.hexdigest()
+    g_file_hashes[path] = (stat.st_mtime_ns, stat.st_size, file_hash)
+    return file_hash
+
+
+def _get_cache_path(path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.pkl")
+
+
+# 缓存文件由两个pickle组成：元数据 和 解析后的数据，校验时只需读取元数据
+def _read_cache_meta(f) -> dict | None:
+    try:
+        meta = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(meta, dict) or meta.get("version") != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _write_cache(cache_path: str, meta: dict, data):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # 临时文件名包含进程和线程id，多个进程或线程同时写入同一缓存时互不影响
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+# 读取 natives 中的 json 文件，解析结果按 路径+内容hash 缓存
+def load_user_data(path: str):
+    stat = os.stat(path)
+    cache_path = _get_cache_path(path)
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            meta = _read_cache_meta(f)
+            if meta is not None:
+                if (
+                    meta["mtime_ns"] == stat.st_mtime_ns
+                    and meta["size"] == stat.st_size
+                ):
+                    return pickle.load(f)
+                # 时间戳变化，内容可能未变
+                if meta["sha1"] == get_file_hash(path):
+                    data = pickle.load(f)
+                    meta["mtime_ns"] = stat.st_mtime_ns
+                    meta["size"] = stat.st_size
+                    f.close()
+                    _write_cache(cache_path, meta, data)
+                    return data
+
+    # 缓存不存在或已过期，重新解析并覆盖旧缓存
+    _evict_missing_once()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    meta = {
+        "version": CACHE_VERSION,
+        "path": os.path.abspath(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": get_file_hash(path),
+    }
+    _write_cache(cache_path, meta, data)
+    return data
+
+
+def _get_file_hash_or_none(path: str) -> str | None:
+    if not os.path.isfile(path):
+        return None
+    return get_file_hash(path)
+
+
+def load_derived_data(
+    name: str,
+    input_paths: list[str],
+    build: Callable[[], object],
+    extra_key: tuple = (),
+):
+    """
+    由多个输入文件计算得到的结果，持久化缓存到 __cache/derived/ 下。
+
+    缓存键由 输入文件路径及内容hash 和 extra_key（如语言）组成，键不一致时调用 build 重新计算并覆盖缓存。
+    不同 extra_key 的结果分别缓存到 <name>.<extra_key hash>.pkl。
+    不存在的输入文件同样作为键的一部分。
+    """
+    key = (
+        tuple((path, _get_file_hash_or_none(path)) for path in input_paths),
+        tuple(extra_key),
+    )
+    extra_hash = hashlib.sha1(repr(key[1]).encode("utf-8")).hexdigest()[:8]
+    cache_path = os.path.join(DERIVED_CACHE_DIR, f"{name}.{extra_hash}.pkl")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            meta = _read_cache_meta(f)
+            if meta is not None and meta.get("key") == key:
+                return pickle.load(f)
+
+    data = build()
+    meta = {"version": CACHE_VERSION, "key": key}
+    _write_cache(cache_path, meta, data)
+    return data
+
+
+# 清除源文件已不存在的缓存，check_content 时同时清除源文件内容已变化的缓存
+# 源文件变化的缓存在下次读取时会被覆盖，只有源文件被删除或移动的缓存会一直残留
+def evict_stale_user_data_cache(check_content: bool = True):
+    if not os.path.exists(CACHE_DIR):
+        return
+    for file_name in os.listdir(CACHE_DIR):
+        # 跳过其他进程正在写入的临时文件
+        if not file_name.endswith(".pkl"):
+            continue
+        cache_path = os.path.join(CACHE_DIR, file_name)
+        stale = True
+        try:
+            with open(cache_path, "rb") as f:
+                meta = _read_cache_meta(f)
+        except FileNotFoundError:
+            continue
+        if meta is not None and os.path.exists(meta["path"]):
+            stale = check_content and meta["sha1"] != get_file_hash(meta["path"])
+        if stale:
+            try:
+                os.remove(cache_path)
+            except FileNotFoundError:
+                pass
+
+
+# 每个进程首次写入缓存时清理一次，使缓存目录不会无限增长
+def _evict_missing_once():
+    global g_cache_evicted
+    if g_cache_evicted:
+        return
+    g_cache_evicted = True
+    evict_stale_user_data_cache(check_content=False)
+
+
+if __name__ == "__main__":
+    evict_stale_user_data_cache()
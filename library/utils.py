@@ -12,20 +12,60 @@ def is_guid_like(text: str) -> bool:
     return re_guid_like.match(text) is not None
 
 
-def minify_nested_serial(obj: dict) -> str | dict:
-    if isinstance(obj, dict) and len(obj) == 1:
-        first_key = list(obj.keys())[0]
-        value = obj[first_key]
-        if "_Value" in value:
-            return value["_Value"]
-        for k, v in value.items():
-            value[k] = minify_nested_serial(v)
-
-    if isinstance(obj, list):
-        for i in range(len(obj)):
-            obj[i] = minify_nested_serial(obj[i])
-
-    return obj
+def _minify_nested(obj: list | dict, unwrap_keys: tuple[str, ...]) -> object:
+    if type(obj) is list:
+        result = None
+        for i, v in enumerate(obj):
+            if type(v) is list or type(v) is dict:
+                new_v = _minify_nested(v, unwrap_keys)
+                if new_v is not v:
+                    if result is None:
+                        result = obj.copy()
+                    result[i] = new_v
+        return obj if result is None else result
+
+    if len(obj) != 1:
+        return obj
+    ((key, value),) = obj.items()
+    if type(value) is not dict:
+        return obj
+    for unwrap_key in unwrap_keys:
+        if unwrap_key in value:
+            return value[unwrap_key]
+    result = None
+    for k, v in value.items():
+        if type(v) is list or type(v) is dict:
+            new_v = _minify_nested(v, unwrap_keys)
+            if new_v is not v:
+                if result is None:
+                    result = value.copy()
+                result[k] = new_v
+    return obj if result is None else {key: result}
+
+
+# 展开RSZ的单键包装结构 {"类型名": {"_Value": x}} -> x，多键dict保持原样
+# 不修改输入：只复制发生变化的路径，未变化的部分直接与输入共享
+def minify_nested_serial(
+    obj: object, unwrap_keys: tuple[str, ...] = ("_Value",)
+) -> object:
+    if type(obj) is not list and type(obj) is not dict:
+        return obj
+    return _minify_nested(obj, unwrap_keys)
+
+
+# 由两列构建 key->value 查找表，替代逐个 df.loc[df[key] == x, value] 的整列扫描
+# key 重复时取第一次出现的值，与 .values[0] 一致；None/NaN 等无法用 == 匹配的 key 不加入
+def create_lookup_dict(df: pd.DataFrame, key_column: str, value_column: str) -> dict:
+    lookup = {}
+    for key, value in zip(df[key_column], df[value_column]):
+        try:
+            if key is None or key != key or key in lookup:
+                continue
+        except TypeError:
+            # list 等不可hash的 key
+            continue
+        lookup[key] = value
+    return lookup
 
 
 # 移除枚举值前缀，只保留枚举名
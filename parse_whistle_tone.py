@@ -1,8 +1,9 @@
-import json
-
 import pandas as pd
 
-from library.utils import minify_nested_serial, remove_enum_value
+from library.artifact import artifact
+from library.text_db import get_global_text_db
+from library.utils import create_lookup_dict, minify_nested_serial, remove_enum_value
+from library.user_data import load_user_data
 
 # 笛子
 # app.Wp05Def.UNIQUE_TYPE_Serializable
@@ -10,6 +11,12 @@ from library.utils import minify_nested_serial, remove_enum_value
 #   -> app.Wp05MusicSkillToneColorTable
 #   -> app.user_data.MusicSkillData_Wp05
 
+TONE_TABLE_PATH = "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneTable.user.3.json"
+TONE_COLOR_TABLE_PATH = "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneColorTable.user.3.json"
+MUSIC_SKILL_DATA_PATH = (
+    "natives/STM/GameDesign/Common/Player/ActionGuide/MusicSkillData_Wp05.user.3.json"
+)
+
 
 class ToneParser(object):
     def __init__(self):
@@ -17,15 +24,15 @@ class ToneParser(object):
         self._tone_color_data = None
         self._music_skill_data = None
         self._text_db = None
+        self._whistle_data = None
+        self._skills_by_mask = None
 
     def set_text_db(self, text_db):
         self._text_db = text_db
 
     # app.Wp05MusicSkillToneTable
     def load_tone_table(self, path: str):
-        data = None
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_user_data(path)
 
         table = []
         for cData in data[0]["app.Wp05MusicSkillToneTable"]["_Datas"]:
@@ -42,9 +49,7 @@ class ToneParser(object):
 
     # app.Wp05MusicSkillToneColorTable
     def load_tone_color_table(self, path: str):
-        data = None
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_user_data(path)
 
         table = []
         for cData in data[0]["app.Wp05MusicSkillToneColorTable"]["_Datas"]:
@@ -61,9 +66,7 @@ class ToneParser(object):
 
     # app.user_data.MusicSkillData_Wp05
     def load_music_skill_data(self, path: str):
-        data = None
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_user_data(path)
 
         table = []
         for cData in data[0]["app.user_data.MusicSkillData_Wp05"]["_Values"]:
@@ -87,18 +90,63 @@ class ToneParser(object):
     def set_whistle_data(self, data: pd.DataFrame):
         self._whistle_data = data
 
-    def parse(self) -> pd.DataFrame:
+    # 建立查询索引，加载数据表后调用，parse 时未建立则自动建立
+    def build_index(self):
         assert self._tone_data is not None
         assert self._tone_color_data is not None
         assert self._music_skill_data is not None
-        assert self._whistle_data is not None
+
+        # 笛子类型 -> 3个音色
+        self._colors_by_type = {}
+        tone_colors = self._tone_data[["ToneColor1", "ToneColor2", "ToneColor3"]]
+        for unique_type, colors in zip(
+            self._tone_data["UniqueType"], tone_colors.values.tolist()
+        ):
+            self._colors_by_type.setdefault(unique_type, colors)
+
+        # 每种音色对应一个二进制位，旋律的音色集合表示为位掩码
+        self._color_bits = {}
+        skill_masks = []
+        color_columns = ["ToneColor1", "ToneColor2", "ToneColor3", "ToneColor4"]
+        for skill, *skill_colors in zip(
+            self._tone_color_data["MusicSkill"],
+            *[self._tone_color_data[col] for col in color_columns],
+        ):
+            mask = 0
+            for color in set(skill_colors) - {"INVALID"}:
+                if color not in self._color_bits:
+                    self._color_bits[color] = 1 << len(self._color_bits)
+                mask |= self._color_bits[color]
+            skill_masks.append((skill, mask))
+
+        # 位掩码 -> 包含这些音色的所有旋律，按表中顺序
+        # 每个旋律登记到其音色集合的所有子集下
+        self._skills_by_mask = {}
+        for skill, mask in skill_masks:
+            sub_mask = mask
+            while True:
+                self._skills_by_mask.setdefault(sub_mask, []).append(skill)
+                if sub_mask == 0:
+                    break
+                sub_mask = (sub_mask - 1) & mask
+
+        self._skill_names = create_lookup_dict(
+            self._music_skill_data, "MusicSkillType", "MusicSkillName"
+        )
+
+    def parse(self, whistle_data: pd.DataFrame | None = None) -> pd.DataFrame:
+        if whistle_data is None:
+            whistle_data = self._whistle_data
+        assert whistle_data is not None
+        if self._skills_by_mask is None:
+            self.build_index()
 
         # app.Wp05Def.UNIQUE_TYPE_Serializable
-        unique_types = self._whistle_data["Wp05UniqueType"]
+        unique_types = whistle_data["Wp05UniqueType"]
         colors_all = [self._get_colors_by_type(t) for t in unique_types]
         skills_all = [self._get_skills_by_colors(c) for c in colors_all]
 
-        output_data = self._whistle_data.copy(deep=True)
+        output_data = whistle_data.copy(deep=True)
         output_data["MusicSkills"] = skills_all
 
         skill_names = []
@@ -109,66 +157,42 @@ class ToneParser(object):
         return output_data
 
     def _get_colors_by_type(self, unique_type: str) -> list[str] | None:
-        colors = self._tone_data.loc[
-            self._tone_data["UniqueType"] == unique_type,
-            ["ToneColor1", "ToneColor2", "ToneColor3"],
-        ]
-        if len(colors) == 0:
-            return None
-        return colors.values[0].tolist()
+        return self._colors_by_type.get(unique_type)
 
     def _get_skills_by_colors(self, colors: list[str]) -> list[str]:
-        skills = []
-        for _, row in self._tone_color_data.iterrows():
-            skill = row["MusicSkill"]
-            skill_colors = {
-                row["ToneColor1"],
-                row["ToneColor2"],
-                row["ToneColor3"],
-                row["ToneColor4"],
-            }
-            skill_colors.discard("INVALID")
-            all_contains = True
-            for color in colors:
-                if color not in skill_colors:
-                    all_contains = False
-                    break
-            if all_contains:
-                skills.append(skill)
-        return skills
+        mask = 0
+        for color in colors:
+            bit = self._color_bits.get(color)
+            # 没有旋律包含该音色
+            if bit is None:
+                return []
+            mask |= bit
+        return list(self._skills_by_mask.get(mask, []))
 
     def _get_skill_name(self, skill_id: str) -> str | None:
         if skill_id == "INVALID":
             return None
-        v = self._music_skill_data.loc[
-            self._music_skill_data["MusicSkillType"] == skill_id, "MusicSkillName"
-        ]
-        if len(v) == 0:
-            return None
-        return v.values[0]
+        return self._skill_names.get(skill_id)
 
 
-if __name__ == "__main__":
+# 加载数据表并建立索引，相同的输入文件和语言只加载一次，多个表格共用
+@artifact(inputs=[TONE_TABLE_PATH, TONE_COLOR_TABLE_PATH, MUSIC_SKILL_DATA_PATH])
+def get_global_tone_parser() -> ToneParser:
     parser = ToneParser()
+    parser.set_text_db(get_global_text_db())
+    parser.load_tone_table(TONE_TABLE_PATH)
+    parser.load_tone_color_table(TONE_COLOR_TABLE_PATH)
+    parser.load_music_skill_data(MUSIC_SKILL_DATA_PATH)
+    parser.build_index()
+    return parser
 
-    from library.text_db import load_text_db
-
-    parser.set_text_db(load_text_db("texts_db.json"))
 
-    parser.load_tone_table(
-        "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneTable.user.3.json"
-    )
-    parser.load_tone_color_table(
-        "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneColorTable.user.3.json"
-    )
-    parser.load_music_skill_data(
-        "natives/STM/GameDesign/Common/Player/ActionGuide/MusicSkillData_Wp05.user.3.json"
-    )
+if __name__ == "__main__":
+    parser = get_global_tone_parser()
 
     from table_equip import dump_weapon_data
 
     weapon_sheets = dump_weapon_data()
-    parser.set_whistle_data(weapon_sheets["Whistle"])
 
-    result = parser.parse()
+    result = parser.parse(weapon_sheets["Whistle"])
     print(result)
@@ -1,33 +1,25 @@
-import json
 import re
 import pandas as pd
-import numpy as np
 import openpyxl
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 
 from library.excel_auto_fit import ExcelAutoFit
 from library.utils import (
+    create_lookup_dict,
     minify_nested_serial,
-    reindex_column,
     remove_enum_value,
 )
-from library.text_db import load_text_db
-from table_equip import dump_weapon_series_data, dump_weapon_data, get_weapon_types
+from library.user_data import load_user_data
+from table_equip import (
+    dump_weapon_series_data,
+    dump_weapon_data_variants,
+    get_weapon_types,
+)
 
-text_db = load_text_db("texts_db.json")
 re_serial_value = re.compile(r"^\[([-\d]+?)\](.*)$")
 
 
-# 获取指定GUID的行列位置（绝对位置int，非索引）
-def get_pos_of_guid(mat: pd.DataFrame, guid: str) -> tuple[int, int]:
-    for i in range(mat.shape[0]):
-        for j in range(mat.shape[1]):
-            if mat.iat[i, j] == guid:
-                return (i, j)
-    return None
-
-
 def sig_set_to_str(sig_set: set) -> str | None:
     if len(sig_set) == 0:
         return None
@@ -53,13 +45,7 @@ def dump_weapon_derive_tree(
     series_data: pd.DataFrame,
     weapon_sheets: dict[str, pd.DataFrame],
 ) -> pd.DataFrame:
-    data = None
-    with open(
-        path,
-        "r",
-        encoding="utf-8",
-    ) as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     tree_table = []
     series_table = []
@@ -104,43 +90,36 @@ def dump_weapon_derive_tree(
     #     "_RowDataLevel": 0
     # }
 
-    # 建立武器位置矩阵
+    # 建立武器位置矩阵，每列右方插入间隔列用于绘制连线
+    # 位置 (行, 列) 对应矩阵中的 (行, 列 * 2)，并移除最后一行和最后的间隔列
     col_max = tree_data["ColumnDataLevel"].max()
     row_max = tree_data["RowDataLevel"].max()
-    weapon_place_matrix = pd.DataFrame(
-        [[None] * (col_max + 1) for _ in range(row_max + 1)],
-        columns=range(col_max + 1),
-        index=range(row_max + 1),
-        dtype="object",
-    ).replace(0, None)
-
-    # 填充数据
-    for _, row in tree_data.iterrows():
-        col_index = row["ColumnDataLevel"]
-        col_name = row["RowDataLevel"]
-        weapon_place_matrix.at[col_name, col_index] = row["Guid"]
-
-    # 创建位置间隔，用于绘制连线
-    for col_name in weapon_place_matrix.columns:
-        # 在col_index右方插入 索引为 f"{col_index}_gap" 的空列
-        gap_name = f"{col_name}_gap"
-        weapon_place_matrix[gap_name] = None
-        weapon_place_matrix = reindex_column(
-            weapon_place_matrix, column=gap_name, next_to=col_name
-        )
-    # 移除最后一行和列
-    weapon_place_matrix = weapon_place_matrix.iloc[:-1, :-1]
-    weapon_place_matrix.replace(np.nan, None, inplace=True)
-
-    # 绘制连线
-    col_max = weapon_place_matrix.shape[1]
-    row_max = weapon_place_matrix.shape[0]
-    line_matrix = pd.DataFrame(
-        [[None] * (col_max) for _ in range(row_max)],
-        columns=range(col_max),
-        index=range(row_max),
-        dtype="object",
-    )
+    place_grid = [[None] * (col_max + 1) for _ in range(row_max + 1)]
+    for guid, row_level, col_level in zip(
+        tree_data["Guid"], tree_data["RowDataLevel"], tree_data["ColumnDataLevel"]
+    ):
+        place_grid[row_level][col_level] = guid
+
+    columns = []
+    for col_index in range(col_max + 1):
+        columns.extend([col_index, f"{col_index}_gap"])
+    columns = columns[:-1]
+    place_grid = [
+        [value for cell in row for value in (cell, None)][:-1]
+        for row in place_grid[:-1]
+    ]
+    max_row = len(place_grid)
+    max_col = len(columns)
+
+    # GUID -> 位置，同一GUID以按行优先遍历时首次出现的位置为准
+    guid_pos = {}
+    for i, row in enumerate(place_grid):
+        for j, guid in enumerate(row):
+            if guid is not None and guid not in guid_pos:
+                guid_pos[guid] = (i, j)
+
+    # 绘制连线，每格记录经过的方向
+    line_grid = [[None] * max_col for _ in range(max_row)]
 
     def _new_set_or_add(set1: set | None, elem) -> set:
         if set1 is None:
@@ -148,64 +127,39 @@ def dump_weapon_derive_tree(
         set1.add(elem)
         return set1
 
-    for _, data in tree_data.iterrows():
-        guid = data["Guid"]
-        next_guid_list = data["NextDataGuidList"]
-        pos = get_pos_of_guid(weapon_place_matrix, guid)
+    for guid, next_guid_list in zip(tree_data["Guid"], tree_data["NextDataGuidList"]):
+        pos = guid_pos.get(guid)
         for next_guid in next_guid_list:
-            next_pos = get_pos_of_guid(weapon_place_matrix, next_guid)
+            next_pos = guid_pos.get(next_guid)
             if not next_pos:
                 continue
             # 在两个位置之间创建连线
             down_steps = next_pos[0] - pos[0]
             right_steps = next_pos[1] - pos[1]
-            curr_pos = (pos[0], pos[1])
+            i, j = pos
             for _ in range(down_steps):
-                # 当前位置修改
-                cell = line_matrix.iat[curr_pos[0], curr_pos[1]]
-                line_matrix.iat[curr_pos[0], curr_pos[1]] = _new_set_or_add(cell, "v")
-                curr_pos = (curr_pos[0] + 1, curr_pos[1])
+                line_grid[i][j] = _new_set_or_add(line_grid[i][j], "v")
+                i += 1
             for _ in range(right_steps):
-                # 当前位置修改
-                cell = line_matrix.iat[curr_pos[0], curr_pos[1]]
-                line_matrix.iat[curr_pos[0], curr_pos[1]] = _new_set_or_add(cell, "->")
-                curr_pos = (curr_pos[0], curr_pos[1] + 1)
-
-    # 优化连线，精确方向
-    max_col = line_matrix.shape[1]
-    max_row = line_matrix.shape[0]
-    for i in range(max_row):
-        for j in range(max_col):
-            cell = line_matrix.iat[i, j]
-            if cell is None:
-                continue
-            if "->" in cell:
-                # 上面的有没有向下箭头
-                if i > 0:
-                    up_cell = line_matrix.iat[i - 1, j]
-                    if up_cell and "v" in up_cell:
-                        cell.add("^")
-    # 移除重复
-    for i in range(line_matrix.shape[0]):
-        for j in range(line_matrix.shape[1]):
-            if weapon_place_matrix.iat[i, j] is None:
-                continue
-            line_matrix.iat[i, j] = None
+                line_grid[i][j] = _new_set_or_add(line_grid[i][j], "->")
+                j += 1
 
-    for i in range(max_row):
+    # 优化连线，精确方向：上面有向下的连线
+    for i in range(1, max_row):
         for j in range(max_col):
-            cell = line_matrix.iat[i, j]
-            if cell is None:
+            cell = line_grid[i][j]
+            if cell is None or "->" not in cell:
                 continue
-            line_matrix.iat[i, j] = sig_set_to_str(cell)
-
-    # 应用连线
-    for i in range(max_row):
-        for j in range(max_col):
-            cell = line_matrix.iat[i, j]
-            if cell is None:
+            up_cell = line_grid[i - 1][j]
+            if up_cell and "v" in up_cell:
+                cell.add("^")
+
+    # 移除与武器重叠的连线，并应用连线
+    for line_row, place_row in zip(line_grid, place_grid):
+        for j, cell in enumerate(line_row):
+            if cell is None or place_row[j] is not None:
                 continue
-            weapon_place_matrix.iat[i, j] = cell
+            place_row[j] = sig_set_to_str(cell)
 
     # 应用名字
     weapon_data = weapon_sheets[weapon_type]
@@ -218,45 +172,43 @@ def dump_weapon_derive_tree(
 
     weapon_data["IdEnumValue"] = weapon_data["Id"].apply(_extract_serial_value)
 
-    for i in range(max_row):
-        for j in range(max_col):
-            prob_guid = weapon_place_matrix.iat[i, j]
-            weapon_index = tree_data.loc[tree_data["Guid"] == prob_guid, "WeaponID"]
-            if len(weapon_index) == 0:
+    guid_weapon_ids = create_lookup_dict(tree_data, "Guid", "WeaponID")
+    weapon_names = create_lookup_dict(weapon_data, "IdEnumValue", "Name")
+    for row in place_grid:
+        for j, prob_guid in enumerate(row):
+            if prob_guid not in guid_weapon_ids:
                 continue
-            weapon_index = weapon_index.iloc[0]
-            name = weapon_data.loc[weapon_data["IdEnumValue"] == weapon_index, "Name"]
-            if len(name) == 0:
+            weapon_index = guid_weapon_ids[prob_guid]
+            if weapon_index not in weapon_names:
                 continue
-            name = name.iloc[0]
-            weapon_place_matrix.iat[i, j] = name
+            row[j] = weapon_names[weapon_index]
 
     # 应用系列名作为行索引
-    for index in weapon_place_matrix.index:
-        series_enum = weapon_series_data.loc[
-            weapon_series_data["RowLevel"] == int(index), "Series"
-        ]
-        if len(series_enum) == 0:
-            continue
-        series_enum = series_enum.iloc[0]
-        series_name = series_data.loc[series_data["Series"] == series_enum, "Name"]
-        if len(series_name) == 0:
-            continue
-        series_name = series_name.iloc[0]
-        weapon_place_matrix.rename(index={index: series_name}, inplace=True)
+    row_series = create_lookup_dict(weapon_series_data, "RowLevel", "Series")
+    series_names = create_lookup_dict(series_data, "Series", "Name")
+    index = []
+    for row_level in range(max_row):
+        series_enum = row_series.get(row_level)
+        if series_enum in series_names:
+            index.append(series_names[series_enum])
+        else:
+            index.append(row_level)
 
+    weapon_place_matrix = pd.DataFrame(
+        place_grid, index=index, columns=columns, dtype="object"
+    )
     return weapon_place_matrix
 
 
 if __name__ == "__main__":
     # text_db.set_global_default_lang(1)
-    
+
     weapon_types = get_weapon_types()
 
     weapon_series_data = dump_weapon_series_data(
         "natives/STM/GameDesign/Common/Equip/WeaponSeriesData.user.3.json"
     )
-    weapon_sheets_with_serial_id = dump_weapon_data(keep_serial_id=True)
+    weapon_sheets, weapon_sheets_with_serial_id = dump_weapon_data_variants()
 
     with pd.ExcelWriter("WeaponCraftTree.xlsx", engine="openpyxl") as writer:
         for weapon_type in weapon_types.keys():
@@ -275,10 +227,11 @@ if __name__ == "__main__":
             left=side_style, right=side_style, top=side_style, bottom=side_style
         )
         # fill_style = PatternFill(fill_type="solid", fgColor="C5C5C5")
-        weapon_sheets = dump_weapon_data(keep_serial_id=False)
         for sheet_name in writer.sheets:
             print(f"Formatting {sheet_name}...")
-            weapon_sheet = weapon_sheets[sheet_name]
+            weapon_attributes = create_lookup_dict(
+                weapon_sheets[sheet_name], "Name", "Attribute"
+            )
             sheet = writer.book[sheet_name]
             max_cols = sheet.max_column
             max_rows = sheet.max_row
@@ -321,11 +274,8 @@ if __name__ == "__main__":
                             cell.border = border_style
                             # cell.fill = fill_style
                             # 判断武器属性
-                            attr = weapon_sheet.loc[
-                                weapon_sheet["Name"] == cell.value, "Attribute"
-                            ]
-                            if len(attr) > 0:
-                                attr = attr.iloc[0]
+                            if cell.value in weapon_attributes:
+                                attr = weapon_attributes[cell.value]
                                 if attr == "FIRE":
                                     cell.font = Font(color="E15057")
                                     cell.value = f"{cell.value} (火)"
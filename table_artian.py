@@ -1,22 +1,23 @@
-import json
 import pandas as pd
 
-from library.excel_auto_fit import ExcelAutoFit
-from library.item_db import ItemDB
-from library.text_db import load_text_db
-from library.utils import minify_nested_serial, reindex_column, remove_enum_value
-from parse_whistle_tone import ToneParser
+from library.export import export_tables, parse_export_args
+from library.item_db import get_global_item_db
+from library.text_db import get_global_text_db
+from library.utils import (
+    create_lookup_dict,
+    minify_nested_serial,
+    reindex_column,
+    remove_enum_value,
+)
+from library.user_data import load_user_data
+from parse_whistle_tone import get_global_tone_parser
 from table_equip import (
-    dump_weapon_data,
     get_gun_shell_type_name,
     get_slash_axe_bin_name,
     process_loading_bin,
 )
 from table_general import dump_user3_data_general, load_enum_internal
 
-item_db = ItemDB("item_db.json")
-text_db = load_text_db("texts_db.json")
-
 # 火、水、电、冰、龙、毒、麻、眠、NONE、榴弹
 SHELL_INDEX_TO_NAME = {
     0: "FIRE",
@@ -33,7 +34,7 @@ SHELL_INDEX_TO_NAME = {
 
 
 def get_item_name_mapping(x):
-    item = item_db.get_entry_by_id(str(x))
+    item = get_global_item_db().get_entry_by_id(str(x))
     if item is None:
         return ""
     return item.raw_name
@@ -61,9 +62,7 @@ def process_artian_gun_shell(shell_lv_list: list[str]) -> list[str]:
 
 
 def dump_artian_judge(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.ArtianJudgeItemData"]["_Values"]:
@@ -85,14 +84,18 @@ def dump_artian_judge(path: str) -> pd.DataFrame:
 def dump_artian_performance(
     path: str,
     bonus_data: pd.DataFrame,
-    weapon_sheets: dict[str, pd.DataFrame],
     enum_internal: dict[str, dict],
     whistle_high_freq_data: pd.DataFrame,
     whistle_hibiki_data: pd.DataFrame,
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    text_db = get_global_text_db()
+    data = load_user_data(path)
+    whistle_high_freq_names = create_lookup_dict(
+        whistle_high_freq_data, "HighFreqType", "SkillName"
+    )
+    whistle_hibiki_names = create_lookup_dict(
+        whistle_hibiki_data, "HiblkiSkillType", "SkillName"
+    )
 
     table = []
     for cData in data[0]["app.user_data.ArtianPerformanceData"]["_Values"]:
@@ -130,18 +133,10 @@ def dump_artian_performance(
                 value = get_slash_axe_bin_name(value)
             elif key == "Wp05MusicSkillHighFreqType":
                 # 笛子
-                v = whistle_high_freq_data.loc[
-                    whistle_high_freq_data["HighFreqType"] == value, "SkillName"
-                ]
-                if len(v) > 0:
-                    value = v.values[0]
+                value = whistle_high_freq_names.get(value, value)
             elif key == "Wp05HibikiSkillType":
                 # 笛子
-                v = whistle_hibiki_data.loc[
-                    whistle_hibiki_data["HiblkiSkillType"] == value, "SkillName"
-                ]
-                if len(v) > 0:
-                    value = v.values[0]
+                value = whistle_hibiki_names.get(value, value)
 
             row[key] = value
         table.append(row)
@@ -189,19 +184,7 @@ def dump_artian_performance(
     df.drop(columns=["ShellName", "ShellLv", "BowgunShellNum"], inplace=True)
 
     # 处理笛子旋律
-    parser = ToneParser()
-    parser.set_text_db(text_db)
-    parser.load_tone_table(
-        "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneTable.user.3.json"
-    )
-    parser.load_tone_color_table(
-        "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneColorTable.user.3.json"
-    )
-    parser.load_music_skill_data(
-        "natives/STM/GameDesign/Common/Player/ActionGuide/MusicSkillData_Wp05.user.3.json"
-    )
-    parser.set_whistle_data(df)
-    df = parser.parse()
+    df = get_global_tone_parser().parse(df)
     df.drop(
         columns=[
             "MusicSkills",
@@ -223,9 +206,7 @@ def dump_artian_parts(path: str) -> pd.DataFrame:
 
 
 def dump_artian_weapon_type(path: str, parts_data: pd.DataFrame) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.ArtianWeaponTypeData"]["_Values"]:
@@ -252,6 +233,7 @@ def dump_artian_weapon_type(path: str, parts_data: pd.DataFrame) -> pd.DataFrame
 
 
 if __name__ == "__main__":
+    args = parse_export_args()
     enum_internal = load_enum_internal()
     whistle_high_freq_data = dump_user3_data_general(
         "natives/STM/GameDesign/Common/Player/ActionGuide/HighFreqData_Wp05.user.3.json",
@@ -269,13 +251,10 @@ if __name__ == "__main__":
         "natives/STM/GameDesign/Facility/ArtianPartsData.user.3.json"
     )
 
-    weapon_sheets = dump_weapon_data()
-
     sheets = {
         "ArtianPerformanceData": dump_artian_performance(
             "natives/STM/GameDesign/Facility/ArtianPerformanceData.user.3.json",
             bonus_data,
-            weapon_sheets,
             enum_internal,
             whistle_high_freq_data,
             whistle_hibiki_data,
@@ -291,9 +270,6 @@ if __name__ == "__main__":
         ),
     }
 
-    with pd.ExcelWriter("ArtianCollection.xlsx", engine="openpyxl") as writer:
-        for sheet_name, df in sheets.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-    autofit = ExcelAutoFit()
-    autofit.style_excel("ArtianCollection.xlsx")
+    export_tables(
+        "ArtianCollection.xlsx", sheets, args.format, streaming=args.streaming
+    )
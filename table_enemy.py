@@ -1,16 +1,18 @@
-import json
 import os
 import pandas as pd
 import openpyxl
-from openpyxl.drawing.image import Image
 from openpyxl.styles import Alignment
 
 from library.excel_auto_fit import ExcelAutoFit
-from library.image_utils import compress_png
-from library.text_db import load_text_db
-from library.utils import is_guid_like, remove_enum_value, reindex_column
+from library.export import export_tables, get_export_path, parse_export_args
+from library.excel_image import create_shared_image, shared_image_media
+from library.image_utils import compress_png, compress_png_batch
+from library.table_spec import TableSpec, dump_table, lookup
+from library.text_db import get_global_text_db
+from library.utils import remove_enum_value, reindex_column
 
-text_db = load_text_db("texts_db.json")
+# 图标显示尺寸，图片预先缩放到该尺寸
+ICON_SIZE = (100, 100)
 
 
 def dump_enemy_data(enemy_path: str, species_path: str) -> pd.DataFrame:
@@ -18,70 +20,46 @@ def dump_enemy_data(enemy_path: str, species_path: str) -> pd.DataFrame:
     return _dump_enemy_data(enemy_path, species_data)
 
 
-def _dump_enemy_data(path: str, species_data: pd.DataFrame) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0]["app.user_data.EnemyData"]["_Values"]:
-        row = {}
-        for key, value in cData["app.user_data.EnemyData.cData"].items():
-            if key.startswith("_"):
-                key = key[1:]
-
-            if is_guid_like(str(value)):
-                # process guids
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                else:
-                    value = ""
-            if key == "Species":
-                specie_name = species_data.loc[
-                    species_data["EmSpecies"] == value, "EmSpeciesName"
-                ]
-                if len(specie_name) > 0:
-                    value = specie_name.values[0]
-
-            value = remove_enum_value(value)
-
-            row[key] = value
-        table.append(row)
-    df = pd.DataFrame(table)
+# 批量处理GUID，之后再移除枚举前缀
+def _resolve_enemy_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = get_global_text_db().resolve_guid_columns(df)
+    for col in df.columns:
+        df[col] = df[col].apply(remove_enum_value)
     # wtf JpEnemyName
     df = reindex_column(df, "JpEnemyName", to_end=True)
-
     return df
 
 
+def _dump_enemy_data(path: str, species_data: pd.DataFrame) -> pd.DataFrame:
+    spec = TableSpec(
+        "app.user_data.EnemyData",
+        minify=False,
+        remove_enum=False,
+        columns={"Species": lookup(species_data, "EmSpecies", "EmSpeciesName")},
+        post=[_resolve_enemy_columns],
+    )
+    return dump_table(path, spec)
+
+
 def dump_species_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0]["app.user_data.EnemySpeciesData"]["_Values"]:
-        row = {}
-        for key, value in cData["app.user_data.EnemySpeciesData.cData"].items():
-            if key.startswith("_"):
-                key = key[1:]
-            if is_guid_like(str(value)):
-                # process guids
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                else:
-                    value = ""
-
-            row[key] = value
-        table.append(row)
-    df = pd.DataFrame(table)
-    return df
+    spec = TableSpec(
+        "app.user_data.EnemySpeciesData",
+        minify=False,
+        remove_enum=False,
+        post=[get_global_text_db().resolve_guid_columns],
+    )
+    return dump_table(path, spec)
+
+
+def get_enemy_icon_path(icon_dir: str, icon_id: str) -> str:
+    if icon_id == "EM1164_50_0":
+        icon_id = "EM1164_00_0"  # sb capcom
+    return os.path.join(icon_dir, f"tex_EmIcon_{icon_id}_IMLM4.tex.241106027.png")
 
 
 def main():
     # text_db.set_global_default_lang(1)
+    args = parse_export_args()
 
     species_data = dump_species_data(
         "natives/STM/GameDesign/Common/Enemy/EnemySpecies.user.3.json"
@@ -104,16 +82,30 @@ def main():
         "EnemyData": enemy_data,
         "SpeciesData": species_data,
     }
+    # 只导出数据时跳过图片和样式处理
+    if args.format != "xlsx":
+        export_tables("EnemyCollection.xlsx", sheets, args.format)
+        return
+
+    icon_dir = "em_icons"
+    # 并行预先压缩所有图标，写入时直接命中缓存
+    icon_paths = [
+        get_enemy_icon_path(icon_dir, icon_id)
+        for icon_id in enemy_data["Icon"]
+        if icon_id
+    ]
+    compress_png_batch([p for p in icon_paths if os.path.exists(p)], size=ICON_SIZE)
 
     autofit = ExcelAutoFit()
-    with pd.ExcelWriter("EnemyCollection.xlsx", engine="openpyxl") as writer:
+    with shared_image_media(), pd.ExcelWriter(
+        get_export_path("EnemyCollection.xlsx"), engine="openpyxl"
+    ) as writer:
         for sheet_name, df in sheets.items():
             df.to_excel(writer, sheet_name=sheet_name, index=False)
 
         # 添加图片 credit: soulize
         ws = writer.book["EnemyData"]
 
-        icon_dir = "em_icons"
         # 遍历第一行（表头），查找Icon列的位置
         icon_col = -1
         for i, col in enumerate(ws.iter_cols()):
@@ -129,23 +121,18 @@ def main():
             for cell in row:
                 icon_id = cell.value
                 if icon_id:
-                    if icon_id == "EM1164_50_0":
-                        icon_id = "EM1164_00_0"  # sb capcom
-                    icon_path = os.path.join(
-                        icon_dir, f"tex_EmIcon_{icon_id}_IMLM4.tex.241106027.png"
-                    )
+                    icon_path = get_enemy_icon_path(icon_dir, icon_id)
                     # 压缩图片
                     try:
-                        icon_path = compress_png(icon_path)
+                        icon_path = compress_png(icon_path, size=ICON_SIZE)
                     except Exception as e:
                         print(f"Error compressing {icon_path}: {e}")
                         continue
 
                     if os.path.exists(icon_path):
                         print(f"Found icon {icon_id}")
-                        img = Image(icon_path)
-                        img.width = 100
-                        img.height = 100
+                        # 相同的图标只在xlsx中保存一份
+                        img = create_shared_image(icon_path, *ICON_SIZE)
                         cell.value = ""
                         # 将图片插入到当前格
                         ws.add_image(
@@ -1,25 +1,28 @@
-import json
 import pandas as pd
-from openpyxl.styles import Alignment
 
-from library.excel_auto_fit import ExcelAutoFit
+from library.artifact import artifact
+from library.export import export_tables, parse_export_args
 from library.item_db import get_global_item_db
 from library.text_db import get_global_text_db
 from library.utils import (
-    is_guid_like,
+    create_lookup_dict,
     minify_nested_serial,
     remove_enum_value,
     reindex_column,
-    rare_enum_to_value,
 )
-from library.rare import apply_fix_rare_colors
+from library.rare import fix_rare_color_cell
+from library.sheet_pipeline import SheetPipeline, wrap_text_pass
+from library.table_spec import TableSpec, dump_table
+from library.user_data import load_user_data
 from table_skill import dump_skill_common_data
-from parse_whistle_tone import ToneParser
+from parse_whistle_tone import (
+    MUSIC_SKILL_DATA_PATH,
+    TONE_COLOR_TABLE_PATH,
+    TONE_TABLE_PATH,
+    get_global_tone_parser,
+)
 from table_general import dump_enum_maker, load_enum_internal, dump_user3_data_general
 
-text_db = get_global_text_db()
-item_db = get_global_item_db()
-
 BOTTLE_ENUM_TO_ITEM_ID = {
     "CLOSE": "ITEM_0702",
     "STRONG": "ITEM_0703",
@@ -91,7 +94,7 @@ def get_bow_bottle_name(enum_name: str) -> str | None:
     item_id = BOTTLE_ENUM_TO_ITEM_ID.get(enum_name.upper())
     if not item_id:
         return None
-    item_entry = item_db.get_entry_by_id(item_id)
+    item_entry = get_global_item_db().get_entry_by_id(item_id)
     if not item_entry:
         return None
     return item_entry.raw_name
@@ -101,7 +104,7 @@ def get_gun_shell_type_name(enum_name: str) -> str | None:
     item_id = GUN_SHELL_TYPE_TO_ITEM_ID.get(enum_name.upper())
     if not item_id:
         return None
-    item_entry = item_db.get_entry_by_id(item_id)
+    item_entry = get_global_item_db().get_entry_by_id(item_id)
     if not item_entry:
         return None
     return item_entry.raw_name
@@ -111,7 +114,7 @@ def get_slash_axe_bin_name(bin_type: str) -> str | None:
     name_id = SLASH_AEX_BIN_TYPE_TO_NAME_ID.get(bin_type.upper())
     if not name_id:
         return None
-    name = text_db.get_text_by_name(name_id)
+    name = get_global_text_db().get_text_by_name(name_id)
     return name
 
 
@@ -171,144 +174,205 @@ def dump_armor_series_enum_maker() -> pd.DataFrame:
     return dump_enum_maker(path)
 
 
-def _dump_weapon_data(
+SKILL_COMMON_DATA_PATH = (
+    "natives/STM/GameDesign/Common/Equip/SkillCommonData.user.3.json"
+)
+WHISTLE_HIGH_FREQ_DATA_PATH = (
+    "natives/STM/GameDesign/Common/Player/ActionGuide/HighFreqData_Wp05.user.3.json"
+)
+WHISTLE_HIBIKI_DATA_PATH = (
+    "natives/STM/GameDesign/Common/Player/ActionGuide/HibikiData_Wp05.user.3.json"
+)
+
+
+def get_weapon_data_path(weapon_type: str) -> str:
+    return f"natives/STM/GameDesign/Common/Weapon/{weapon_type}.user.3.json"
+
+
+# dump_weapon_data 依赖的所有输入文件
+def get_weapon_data_inputs() -> list[str]:
+    paths = [get_weapon_data_path(weapon_type) for weapon_type in get_weapon_types()]
+    paths.extend(
+        [
+            SKILL_COMMON_DATA_PATH,
+            WHISTLE_HIGH_FREQ_DATA_PATH,
+            WHISTLE_HIBIKI_DATA_PATH,
+            TONE_TABLE_PATH,
+            TONE_COLOR_TABLE_PATH,
+            MUSIC_SKILL_DATA_PATH,
+            "Enums_Internal.json",
+        ]
+    )
+    return paths
+
+
+# 获取武器数据中当前武器类型需要保留的列，返回新列名，排除的列返回 None
+def _get_weapon_column_name(
+    key: str,
+    weapon_type: str,
+    weapon_types: dict[str, int],
+) -> str | None:
+    if key.startswith("_"):
+        key = key[1:]
+    key_lower = key.lower()
+    if key_lower == weapon_type:
+        key = "Id"
+    if key_lower in weapon_types and key_lower != weapon_type:
+        return None
+    # 批量处理列名带 wpxx 的列，排除无关列
+    for wp_type, wp_type_id in weapon_types.items():
+        wp_short_id = f"wp{wp_type_id:02d}"
+        if key_lower.find(wp_short_id) != -1 and wp_type != weapon_type:
+            return None
+    if weapon_type != "rod" and key == "RodInsectLv":
+        return None
+    if weapon_type not in {"heavybowgun", "lightbowgun"} and key in {
+        "MainShell",
+        "ShellLv",
+        "ShellNum",
+        "CustomizePattern",
+        "DispSilencer",
+        "DispBarrel",
+    }:
+        return None
+    if weapon_type != "lightbowgun" and key in {"RapidShellNum", "IsRappid"}:
+        return None
+    if weapon_type != "heavybowgun" and key in {
+        "EnergyEfficiency",
+        "AmmoStrength",
+        "EnergyShellTypeNormal",
+        "EnergyShellTypeNormal",
+        "EnergyShellTypePower",
+        "EnergyShellTypeWeak",
+    }:
+        return None
+    if weapon_type != "bow" and key == "isLoadingBin":
+        return None
+    if weapon_type in {"lightbowgun", "heavybowgun", "bow"} and key in {
+        "SharpnessValList",
+        "TakumiValList",
+    }:
+        return None
+    return key
+
+
+# 列的取舍只与 武器类型 和 文件结构 有关，每种结构只计算一次
+# 返回 [(原列名, 新列名), ...]
+def _get_weapon_column_plan(
+    keys: tuple[str, ...],
+    weapon_type: str,
+    weapon_types: dict[str, int],
+    plans: dict[tuple[str, ...], list[tuple[str, str]]],
+) -> list[tuple[str, str]]:
+    plan = plans.get(keys)
+    if plan is None:
+        plan = []
+        for key in keys:
+            name = _get_weapon_column_name(key, weapon_type, weapon_types)
+            if name is not None:
+                plan.append((key, name))
+        plans[keys] = plan
+    return plan
+
+
+# 读取武器数据，排除与当前武器类型无关的列
+def _load_weapon_rows(
     path: str,
     weapon_type: str,
     weapon_types: dict[str, int],
-    skill_common_data: pd.DataFrame,
+) -> list[dict]:
+    data = load_user_data(path)
+
+    plans = {}
+    rows = []
+    for cData in data[0]["app.user_data.WeaponData"]["_Values"]:
+        cData = cData["app.user_data.WeaponData.cData"]
+        plan = _get_weapon_column_plan(tuple(cData), weapon_type, weapon_types, plans)
+        row = {}
+        for key, name in plan:
+            row[name] = minify_nested_serial(cData[key])
+        rows.append(row)
+    return rows
+
+
+def _resolve_slot_levels(value: list[str]) -> list[int | str]:
+    levels = []
+    for level in value:
+        if level.find("NONE") != -1:
+            level = 0
+        elif level.find("Lv1") != -1:
+            level = 1
+        elif level.find("Lv2") != -1:
+            level = 2
+        elif level.find("Lv3") != -1:
+            level = 3
+        else:
+            print(f"Unknown level: {level}")
+        levels.append(level)
+    return levels
+
+
+# 由 _load_weapon_rows 的结果生成表格，不修改 rows，同一份 rows 可生成多个变体
+def _dump_weapon_data(
+    rows: list[dict],
+    weapon_type: str,
+    skill_names: dict[str, str],
     enum_internal: dict[str, dict],
-    whistle_high_freq_data: pd.DataFrame,
-    whistle_hibiki_data: pd.DataFrame,
+    whistle_high_freq_names: dict[str, str],
+    whistle_hibiki_names: dict[str, str],
     keep_serial_id: bool = False,
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    # 处理Skill
+    def _resolve_skills(value: list[str]) -> list[str]:
+        skills = []
+        for skill in value:
+            if skill.find("NONE") == -1:
+                skill = skill_names.get(skill, skill)
+            skills.append(skill)
+        return skills
+
+    # 需要特殊处理的列
+    transforms = {
+        "Skill": _resolve_skills,
+        # 弓箭瓶子处理
+        "isLoadingBin": lambda value: process_loading_bin(value, enum_internal),
+        # 斩斧瓶子
+        "Wp08BinType": get_slash_axe_bin_name,
+        # 笛子
+        "Wp05MusicSkillHighFreqType": lambda value: whistle_high_freq_names.get(
+            value, value
+        ),
+        "Wp05HibikiSkillType": lambda value: whistle_hibiki_names.get(value, value),
+        "SlotLevel": _resolve_slot_levels,
+    }
 
     table = []
-    for cData in data[0]["app.user_data.WeaponData"]["_Values"]:
+    for raw_row in rows:
         row = {}
-        for key, value in cData["app.user_data.WeaponData.cData"].items():
-            if key.startswith("_"):
-                key = key[1:]
-            key_lower = key.lower()
-            if key_lower == weapon_type:
-                key = "Id"
-            if key_lower in weapon_types and key_lower != weapon_type:
-                continue
-            # 批量处理列名带 wpxx 的列，排除无关列
-            exclude = False
-            for wp_type, wp_type_id in weapon_types.items():
-                wp_short_id = f"wp{wp_type_id:02d}"
-                if key_lower.find(wp_short_id) != -1 and wp_type != weapon_type:
-                    exclude = True
-                    break
-            if exclude:
-                continue
-            if weapon_type != "rod" and key == "RodInsectLv":
-                continue
-            if weapon_type not in {"heavybowgun", "lightbowgun"} and key in {
-                "MainShell",
-                "ShellLv",
-                "ShellNum",
-                "CustomizePattern",
-                "DispSilencer",
-                "DispBarrel",
-            }:
-                continue
-            if weapon_type != "lightbowgun" and key in {"RapidShellNum", "IsRappid"}:
-                continue
-            if weapon_type != "heavybowgun" and key in {
-                "EnergyEfficiency",
-                "AmmoStrength",
-                "EnergyShellTypeNormal",
-                "EnergyShellTypeNormal",
-                "EnergyShellTypePower",
-                "EnergyShellTypeWeak",
-            }:
-                continue
-            if weapon_type != "bow" and key == "isLoadingBin":
-                continue
-            if weapon_type in {"lightbowgun", "heavybowgun", "bow"} and key in {
-                "SharpnessValList",
-                "TakumiValList",
-            }:
-                continue
-
-            value = minify_nested_serial(value)
+        for key, value in raw_row.items():
             if not keep_serial_id:
                 value = remove_enum_value(value)
-
-            if key == "Skill":
-                # 处理Skill
-                for i, skill in enumerate(value):
-                    if skill.find("NONE") != -1:
-                        continue
-                    skill_name = skill_common_data.loc[
-                        skill_common_data["skillId"] == skill, "skillName"
-                    ]
-                    if len(skill_name) > 0:
-                        value[i] = skill_name.values[0]
-            elif key == "isLoadingBin":
-                # 弓箭瓶子处理
-                bottle_names = process_loading_bin(value, enum_internal)
-                value = bottle_names
-            elif key == "Wp08BinType":
-                # 斩斧瓶子
-                value = get_slash_axe_bin_name(value)
-            elif key == "Wp05MusicSkillHighFreqType":
-                # 笛子
-                v = whistle_high_freq_data.loc[
-                    whistle_high_freq_data["HighFreqType"] == value, "SkillName"
-                ]
-                if len(v) > 0:
-                    value = v.values[0]
-            elif key == "Wp05HibikiSkillType":
-                # 笛子
-                v = whistle_hibiki_data.loc[
-                    whistle_hibiki_data["HiblkiSkillType"] == value, "SkillName"
-                ]
-                if len(v) > 0:
-                    value = v.values[0]
-
-            if is_guid_like(str(value)):
-                # process guids
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                else:
-                    value = ""
-
-            # 处理SlotLevel
-            if key == "SlotLevel":
-                for i, level in enumerate(value):
-                    if level.find("NONE") != -1:
-                        value[i] = 0
-                    elif level.find("Lv1") != -1:
-                        value[i] = 1
-                    elif level.find("Lv2") != -1:
-                        value[i] = 2
-                    elif level.find("Lv3") != -1:
-                        value[i] = 3
-                    else:
-                        print(f"Unknown level: {level}")
-
+            transform = transforms.get(key)
+            if transform is not None:
+                value = transform(value)
             row[key] = value
         table.append(row)
 
     df = pd.DataFrame(table)
+    # 批量处理GUID
+    df = get_global_text_db().resolve_guid_columns(df)
     # 拆分skill列
-    skill_names = df["Skill"]
+    skill_lists = df["Skill"]
     skill_levels = df["SkillLevel"]
     all_skills = []
-    for i in range(len(skill_names)):
+    for i in range(len(skill_lists)):
         skills = []
-        for j in range(len(skill_names[i])):
+        for j in range(len(skill_lists[i])):
             level = skill_levels[i][j]
             if level == 0:
                 skills.append(None)
             else:
-                skills.append(f"{skill_names[i][j]}: {level}")
+                skills.append(f"{skill_lists[i][j]}: {level}")
         skills = list(filter(lambda x: x is not None, skills))
         all_skills.append(skills)
     df["SkillAndLevel"] = all_skills
@@ -320,19 +384,7 @@ def _dump_weapon_data(
 
     # 处理笛子旋律
     if weapon_type == "whistle" and not keep_serial_id:
-        parser = ToneParser()
-        parser.set_text_db(text_db)
-        parser.load_tone_table(
-            "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneTable.user.3.json"
-        )
-        parser.load_tone_color_table(
-            "natives/STM/GameDesign/Player/ActionData/Wp05/UserData/Wp05MusicSkillToneColorTable.user.3.json"
-        )
-        parser.load_music_skill_data(
-            "natives/STM/GameDesign/Common/Player/ActionGuide/MusicSkillData_Wp05.user.3.json"
-        )
-        parser.set_whistle_data(df)
-        df = parser.parse()
+        df = get_global_tone_parser().parse(df)
         df.drop(
             columns=[
                 "MusicSkills",
@@ -388,52 +440,70 @@ def _dump_weapon_data(
     return df
 
 
-def dump_weapon_data(keep_serial_id: bool = False) -> dict[str, pd.DataFrame]:
+# 一次解析武器数据，生成 keep_serial_id 取各个值的表格
+def _dump_weapon_sheets(
+    variants: tuple[bool, ...],
+) -> dict[bool, dict[str, pd.DataFrame]]:
     weapon_types = get_weapon_types()
     weapon_types_lower = {}
     for key, value in weapon_types.items():
         weapon_types_lower[key.lower()] = value
 
-    weapon_paths = {}
-    for weapon_type in weapon_types.keys():
-        weapon_paths[weapon_type] = (
-            f"natives/STM/GameDesign/Common/Weapon/{weapon_type}.user.3.json"
-        )
-
-    skill_common_data = dump_skill_common_data(
-        "natives/STM/GameDesign/Common/Equip/SkillCommonData.user.3.json"
-    )
+    skill_common_data = dump_skill_common_data(SKILL_COMMON_DATA_PATH)
+    skill_names = create_lookup_dict(skill_common_data, "skillId", "skillName")
     enum_internal = load_enum_internal()
 
     whistle_high_freq_data = dump_user3_data_general(
-        "natives/STM/GameDesign/Common/Player/ActionGuide/HighFreqData_Wp05.user.3.json",
+        WHISTLE_HIGH_FREQ_DATA_PATH,
         "app.user_data.HighFreqData_Wp05",
     )
     whistle_hibiki_data = dump_user3_data_general(
-        "natives/STM/GameDesign/Common/Player/ActionGuide/HibikiData_Wp05.user.3.json",
+        WHISTLE_HIBIKI_DATA_PATH,
         "app.user_data.HibikiData_Wp05",
     )
+    whistle_high_freq_names = create_lookup_dict(
+        whistle_high_freq_data, "HighFreqType", "SkillName"
+    )
+    whistle_hibiki_names = create_lookup_dict(
+        whistle_hibiki_data, "HiblkiSkillType", "SkillName"
+    )
 
-    sheets = {}
-    for weapon_type, path in weapon_paths.items():
-        df = _dump_weapon_data(
-            weapon_paths[weapon_type],
+    sheets = {keep_serial_id: {} for keep_serial_id in variants}
+    for weapon_type in weapon_types.keys():
+        rows = _load_weapon_rows(
+            get_weapon_data_path(weapon_type),
             weapon_type.lower(),
             weapon_types_lower,
-            skill_common_data,
-            enum_internal,
-            whistle_high_freq_data=whistle_high_freq_data,
-            whistle_hibiki_data=whistle_hibiki_data,
-            keep_serial_id=keep_serial_id,
         )
-        sheets[weapon_type] = df
+        for keep_serial_id in variants:
+            sheets[keep_serial_id][weapon_type] = _dump_weapon_data(
+                rows,
+                weapon_type.lower(),
+                skill_names,
+                enum_internal,
+                whistle_high_freq_names=whistle_high_freq_names,
+                whistle_hibiki_names=whistle_hibiki_names,
+                keep_serial_id=keep_serial_id,
+            )
     return sheets
 
 
+@artifact(inputs=get_weapon_data_inputs)
+def dump_weapon_data(keep_serial_id: bool = False) -> dict[str, pd.DataFrame]:
+    return _dump_weapon_sheets((keep_serial_id,))[keep_serial_id]
+
+
+# 同时需要两种结果时使用，返回 (去除枚举值, 保留枚举值)
+@artifact(inputs=get_weapon_data_inputs)
+def dump_weapon_data_variants() -> (
+    tuple[dict[str, pd.DataFrame], dict[str, pd.DataFrame]]
+):
+    sheets = _dump_weapon_sheets((False, True))
+    return sheets[False], sheets[True]
+
+
 def dump_armor_data() -> pd.DataFrame:
-    skill_common_data = dump_skill_common_data(
-        "natives/STM/GameDesign/Common/Equip/SkillCommonData.user.3.json"
-    )
+    skill_common_data = dump_skill_common_data(SKILL_COMMON_DATA_PATH)
     armorseries_data = dump_armor_series_data(
         "natives/STM/GameDesign/Common/Equip/ArmorSeriesData.user.3.json"
     )
@@ -450,9 +520,9 @@ def _dump_armor_data(
     skill_common_data: pd.DataFrame,
     armor_series_data: pd.DataFrame,
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_user_data(path)
+    skill_names = create_lookup_dict(skill_common_data, "skillId", "skillName")
+    series_names = create_lookup_dict(armor_series_data, "Series", "Name")
 
     table = []
     for cData in data[0]["app.user_data.ArmorData"]["_Values"]:
@@ -468,19 +538,8 @@ def _dump_armor_data(
                 for i, skill in enumerate(value):
                     if skill.find("NONE") != -1:
                         continue
-                    skill_name = skill_common_data.loc[
-                        skill_common_data["skillId"] == skill, "skillName"
-                    ]
-                    if len(skill_name) > 0:
-                        value[i] = skill_name.values[0]
-
-            if is_guid_like(str(value)):
-                # process guids
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                else:
-                    value = ""
+                    value[i] = skill_names.get(skill, skill)
+
             # 处理SlotLevel
             if key == "SlotLevel":
                 for i, level in enumerate(value):
@@ -499,28 +558,23 @@ def _dump_armor_data(
         table.append(row)
 
     df = pd.DataFrame(table)
+    # 批量处理GUID
+    df = get_global_text_db().resolve_guid_columns(df)
     # Series列改成名字，SeriesId改成原Series
     df["SeriesId"] = df["Series"]
-    series_names = []
-    for series_id in df["SeriesId"]:
-        v = armor_series_data.loc[armor_series_data["Series"] == series_id, "Name"]
-        if len(v) > 0:
-            series_names.append(v.iloc[0])
-        else:
-            series_names.append(None)
-    df["Series"] = series_names
+    df["Series"] = [series_names.get(series_id) for series_id in df["SeriesId"]]
     # 拆分skill列
-    skill_names = df["Skill"]
+    skill_lists = df["Skill"]
     skill_levels = df["SkillLevel"]
     all_skills = []
-    for i in range(len(skill_names)):
+    for i in range(len(skill_lists)):
         skills = []
-        for j in range(len(skill_names[i])):
+        for j in range(len(skill_lists[i])):
             level = skill_levels[i][j]
             if level == 0:
                 skills.append(None)
             else:
-                skills.append(f"{skill_names[i][j]}: {level}")
+                skills.append(f"{skill_lists[i][j]}: {level}")
         skills = list(filter(lambda x: x is not None, skills))
         all_skills.append(skills)
     df["SkillAndLevel"] = all_skills
@@ -532,93 +586,46 @@ def _dump_armor_data(
 
 
 def dump_weapon_series_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0]["app.user_data.WeaponSeriesData"]["_Values"]:
-        cData = cData["app.user_data.WeaponSeriesData.cData"]
-        row = {}
-        for key, value in cData.items():
-            if key.startswith("_"):
-                key = key[1:]
-
-            value = minify_nested_serial(value)
-            value = remove_enum_value(value)
-            text = text_db.get_text_by_guid(str(value))
-            if text:
-                value = text
-            row[key] = value
-        table.append(row)
-    df = pd.DataFrame(table)
-    return df
+    spec = TableSpec(
+        "app.user_data.WeaponSeriesData",
+        post=[
+            lambda df: get_global_text_db().resolve_guid_columns(df, keep_missing=True)
+        ],
+    )
+    return dump_table(path, spec)
 
 
 def dump_armor_series_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0]["app.user_data.ArmorSeriesData"]["_Values"]:
-        cData = cData["app.user_data.ArmorSeriesData.cData"]
-        row = {}
-        for key, value in cData.items():
-            if key.startswith("_"):
-                key = key[1:]
-
-            value = minify_nested_serial(value)
-            value = remove_enum_value(value)
-            text = text_db.get_text_by_guid(str(value))
-            if text:
-                value = text
-            row[key] = value
-        table.append(row)
-    return pd.DataFrame(table)
+    spec = TableSpec(
+        "app.user_data.ArmorSeriesData",
+        post=[
+            lambda df: get_global_text_db().resolve_guid_columns(df, keep_missing=True)
+        ],
+    )
+    return dump_table(path, spec)
 
 
 if __name__ == "__main__":
     # text_db.set_global_default_lang(1)
+    args = parse_export_args()
 
     armor_data = dump_armor_data()
     armor_data.drop(columns=["SeriesId"], inplace=True)
 
-    sheets = dump_weapon_data()
-    with pd.ExcelWriter("EquipCollection.xlsx") as writer:
-        armor_data.to_excel(writer, sheet_name="Armor", index=False)
-
-        for sheet_name, df in sheets.items():
-            # 武器表名前加 Wp_ 前缀
-            sheet_name = f"Wp_{sheet_name}"
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        print("Applying autofit...")
-        autofit = ExcelAutoFit()
-        autofit.style_workbook(writer.book)
-
-        print("Applying rare colors...")
-        apply_fix_rare_colors(writer.book)
-
-        align_wrap = Alignment(wrap_text=True)
-        for sheet_name in writer.sheets:
-            sheet = writer.sheets[sheet_name]
-            # RARE修正
-            for row in range(1, sheet.max_row + 1):
-                for col in range(1, sheet.max_column + 1):
-                    cell = sheet.cell(row=row, column=col)
-                    if isinstance(cell.value, str):
-                        cell.value = rare_enum_to_value(cell.value)
-            # Explain列添加自动换行
-            # 查找Explain列
-            explain_col = None
-            for col in range(1, sheet.max_column + 1):
-                cell = sheet.cell(row=1, column=col)
-                if cell.value == "Explain":
-                    explain_col = col
-                    break
-            if explain_col is not None:
-                for row in range(2, sheet.max_row + 1):
-                    cell = sheet.cell(row=row, column=explain_col)
-                    if isinstance(cell.value, str):
-                        cell.alignment = align_wrap
+    sheets = {"Armor": armor_data}
+    for sheet_name, df in dump_weapon_data().items():
+        # 武器表名前加 Wp_ 前缀
+        sheets[f"Wp_{sheet_name}"] = df
+
+    pipeline = SheetPipeline()
+    # RARE着色并修正为数值
+    pipeline.add_cell_pass(fix_rare_color_cell)
+    # Explain列添加自动换行
+    pipeline.add_column_pass(wrap_text_pass, {"Explain"}, min_row=2)
+    export_tables(
+        "EquipCollection.xlsx",
+        sheets,
+        args.format,
+        pipeline=pipeline,
+        streaming=args.streaming,
+    )
@@ -1,9 +1,9 @@
-import json
 import pandas as pd
 
-from library.excel_auto_fit import ExcelAutoFit
-from library.item_db import ItemDB
+from library.export import export_tables, parse_export_args
+from library.item_db import get_global_item_db
 from library.utils import remove_enum_value, reindex_column
+from library.user_data import load_user_data
 from table_equip import (
     dump_armor_series_data,
     get_weapon_types,
@@ -11,9 +11,8 @@ from table_equip import (
     dump_armor_data,
 )
 from table_enemy import dump_enemy_data
-from table_quest import get_mission_data
+from table_quest import get_key_stories, get_mission_data, get_mission_names
 
-item_db = ItemDB("item_db.json")
 weapon_types = get_weapon_types()
 
 
@@ -25,9 +24,8 @@ def dump_weapon_recipe_data(
     weapon_type: str,
     weapon_types: dict[str, int],
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.WeaponRecipeData"]["_Values"]:
@@ -70,18 +68,7 @@ def dump_weapon_recipe_data(
 
     df = pd.DataFrame(table)
     # 增加KeyStory列
-    stories = []
-    for _, row in df.iterrows():
-        id = row["KeyStoryNo"]
-        if not id:
-            stories.append("")
-            continue
-        v = mission_data.loc[mission_data["MissionIDSerial"] == id, "SetLGuideMsgData"]
-        if len(v) > 0:
-            stories.append(v.iloc[0])
-        else:
-            stories.append("")
-    df["KeyStory"] = stories
+    df["KeyStory"] = get_key_stories(df["KeyStoryNo"], get_mission_names(mission_data))
     df = reindex_column(df, column="KeyStory", next_to="KeyStoryNo")
 
     # 列重命名
@@ -96,9 +83,8 @@ def dump_armor_recipe_data(
     armor_data: pd.DataFrame,
     mission_data: pd.DataFrame,
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.ArmorRecipeData"]["_Values"]:
@@ -158,18 +144,7 @@ def dump_armor_recipe_data(
     df = reindex_column(df, column="Name", next_to="PartsType")
 
     # 增加KeyStory列
-    stories = []
-    for _, row in df.iterrows():
-        id = row["KeyStoryNo"]
-        if not id:
-            stories.append("")
-            continue
-        v = mission_data.loc[mission_data["MissionIDSerial"] == id, "SetLGuideMsgData"]
-        if len(v) > 0:
-            stories.append(v.iloc[0])
-        else:
-            stories.append("")
-    df["KeyStory"] = stories
+    df["KeyStory"] = get_key_stories(df["KeyStoryNo"], get_mission_names(mission_data))
     df = reindex_column(df, column="KeyStory", next_to="KeyStoryNo")
 
     df.rename(columns={"KeyItemId": "KeyItem", "KeyEnemyId": "KeyEnemy"}, inplace=True)
@@ -194,6 +169,7 @@ def _merge_item_and_num(df: pd.DataFrame) -> pd.DataFrame:
 
 
 if __name__ == "__main__":
+    args = parse_export_args()
     weapon_sheet = dump_weapon_data()
     enemy_data = dump_enemy_data(
         "natives/STM/GameDesign/Common/Enemy/EnemyData.user.3.json",
@@ -230,11 +206,12 @@ if __name__ == "__main__":
 
         weapon_sheets[weapon_type] = data
 
-    auto_fit = ExcelAutoFit()
-    with pd.ExcelWriter("EquipRecipeCollection.xlsx") as writer:
-        armor_recipe_data.to_excel(writer, sheet_name="Armor", index=False)
-
-        for weapon_type, data in weapon_sheets.items():
-            data.to_excel(writer, sheet_name=f"Wp_{weapon_type}", index=False)
-
-        auto_fit.style_workbook(writer.book)
+    sheets = {"Armor": armor_recipe_data}
+    for weapon_type, data in weapon_sheets.items():
+        sheets[f"Wp_{weapon_type}"] = data
+    export_tables(
+        "EquipRecipeCollection.xlsx",
+        sheets,
+        args.format,
+        streaming=args.streaming,
+    )
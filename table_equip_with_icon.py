@@ -2,69 +2,101 @@ import pandas as pd
 import os
 
 import openpyxl
-from openpyxl.drawing.image import Image as OpenpyxlImage
-from openpyxl.styles import Alignment
 from openpyxl.utils import get_column_letter
 
-from library.excel_auto_fit import ExcelAutoFit
-from library.utils import rare_enum_to_value, reindex_column, seperate_enum_value
-from library.image_utils import compress_png
+from library.export import export_tables, parse_export_args
+from library.rare import fix_rare_value_cell
+from library.sheet_pipeline import SheetPipeline, wrap_all_pass
+from library.utils import reindex_column, seperate_enum_value
+from library.excel_image import create_shared_image, shared_image_media
+from library.image_utils import compress_png, compress_png_batch
 from table_equip import (
     dump_armor_data,
-    dump_weapon_data,
+    dump_weapon_data_variants,
     get_weapon_types,
     dump_armor_series_enum_maker,
 )
 from table_general import create_icon_flag, parse_icon_flag
 
+ICON_COLUMN_WIDTH = 13
+# 图标显示尺寸，图片预先缩放到该尺寸
+ICON_SIZE = (100, 100)
+
+
+# SheetPipeline 单元格处理：将icon flag替换为图片，需注册为 min_row=2
+def icon_cell_pass(icon_dir: str):
+    def _apply_icon(cell, header):
+        if not isinstance(cell.value, str):
+            return
+        icon_flag = parse_icon_flag(cell.value)
+        if not icon_flag:
+            return
+        icon_file_name = icon_flag["path"]
+        if not icon_file_name:
+            return
+        sheet = cell.parent
+        # 调整列宽
+        sheet.column_dimensions[get_column_letter(cell.column)].width = (
+            ICON_COLUMN_WIDTH
+        )
+        # 读取文件并插入图片
+        icon_path = os.path.join(
+            icon_dir,
+            icon_file_name,
+        )
+        # 压缩图片
+        try:
+            icon_path = compress_png(icon_path, size=ICON_SIZE)
+        except Exception as e:
+            print(f"Error compressing {icon_path}: {e}")
+            return
+
+        if os.path.exists(icon_path):
+            # 相同的图标只在xlsx中保存一份
+            img = create_shared_image(icon_path, *ICON_SIZE)
+            cell.value = ""
+            # 将图片插入到当前格
+            sheet.add_image(
+                img,
+                get_column_letter(cell.column) + str(cell.row),
+            )
+            # 调整行高
+            sheet.row_dimensions[cell.row].height = 80
+        else:
+            print(f"File not found: {icon_path}")
+
+    return _apply_icon
+
+
+# 并行预先压缩表格中引用的所有图标，写入时直接命中缓存
+def precompress_icons(
+    sheets: dict[str, pd.DataFrame], icon_dir: str, columns: list[str]
+):
+    icon_paths = []
+    for df in sheets.values():
+        for column in columns:
+            if column not in df.columns:
+                continue
+            for value in df[column]:
+                if not isinstance(value, str):
+                    continue
+                icon_flag = parse_icon_flag(value)
+                if not icon_flag or not icon_flag["path"]:
+                    continue
+                icon_path = os.path.join(icon_dir, icon_flag["path"])
+                if os.path.exists(icon_path):
+                    icon_paths.append(icon_path)
+    compress_png_batch(icon_paths, size=ICON_SIZE)
+
 
 def apply_icons(
     workbook: openpyxl.Workbook,
     icon_dir: str,
     skip_row: int = 0,
 ):
-    for sheet_name in workbook.sheetnames:
-        sheet = writer.book[sheet_name]
-
-        # 遍历所有单元格，查找icon flag
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=2)):
-            for col_idx, cell in enumerate(row):
-                if not isinstance(cell.value, str):
-                    continue
-                icon_flag = parse_icon_flag(cell.value)
-                if not icon_flag:
-                    continue
-                icon_file_name = icon_flag["path"]
-                if not icon_file_name:
-                    continue
-                # 调整列宽
-                sheet.column_dimensions[get_column_letter(col_idx + 1)].width = 13
-                # 读取文件并插入图片
-                icon_path = os.path.join(
-                    icon_dir,
-                    icon_file_name,
-                )
-                # 压缩图片
-                try:
-                    icon_path = compress_png(icon_path)
-                except Exception as e:
-                    print(f"Error compressing {icon_path}: {e}")
-                    continue
-
-                if os.path.exists(icon_path):
-                    img = OpenpyxlImage(icon_path)
-                    img.width = 100
-                    img.height = 100
-                    cell.value = ""
-                    # 将图片插入到当前格
-                    sheet.add_image(
-                        img,
-                        get_column_letter(col_idx + 1) + str(cell.row),
-                    )
-                    # 调整行高
-                    sheet.row_dimensions[cell.row].height = 80
-                else:
-                    print(f"File not found: {icon_path}")
+    pipeline = SheetPipeline()
+    pipeline.add_cell_pass(icon_cell_pass(icon_dir), min_row=2 + skip_row)
+    pipeline.run_workbook(workbook)
 
 
 def append_icon_col_weapon(
@@ -132,73 +164,60 @@ def append_icon_col_armor(
 
 
 if __name__ == "__main__":
+    args = parse_export_args()
+
     print("Dumping weapon data...")
-    weapon_sheets_serial = dump_weapon_data(keep_serial_id=True)
-    weapon_sheets = dump_weapon_data(keep_serial_id=False)
+    weapon_sheets, weapon_sheets_serial = dump_weapon_data_variants()
     weapon_types = get_weapon_types()
     armor_data = dump_armor_data()
     armor_series_enum_maker = dump_armor_series_enum_maker()
 
     icon_dir = "C:/Users/Eigeen/Downloads/tex"
 
-    autofit = ExcelAutoFit()
-    with pd.ExcelWriter("WeaponDataWithIcon.xlsx") as writer:
-        for weapon_type, weapon_data in weapon_sheets.items():
-            weapon_data = append_icon_col_weapon(
-                weapon_data,
-                weapon_sheets_serial[weapon_type],
-                weapon_types[weapon_type],
-            )
+    for weapon_type, weapon_data in weapon_sheets.items():
+        weapon_sheets[weapon_type] = append_icon_col_weapon(
+            weapon_data,
+            weapon_sheets_serial[weapon_type],
+            weapon_types[weapon_type],
+        )
 
-            weapon_data.to_excel(writer, sheet_name=weapon_type, index=False)
-
-        print("Styling...")
-        autofit.style_workbook(writer.book, max_width=60)
-
-        print("Applying wrap text alignment...")
-        align_wrap = Alignment(wrapText=True)
-        for sheet_name in writer.sheets:
-            sheet = writer.book[sheet_name]
-            # RARE修正
-            for row in range(1, sheet.max_row + 1):
-                for col in range(1, sheet.max_column + 1):
-                    cell = sheet.cell(row=row, column=col)
-                    if isinstance(cell.value, str):
-                        cell.value = rare_enum_to_value(cell.value)
-            # 为所有非表头格应用自动换行
-            for row in sheet.iter_rows(min_row=3):
-                for cell in row:
-                    cell.alignment = align_wrap
-            # # 首行增加一行，加签名
-            # sheet.insert_rows(1)
-            # sheet.cell(row=1, column=1).value = (
-            #     "解包：剧透猎人老金群  制表：Eigeen本征  版本：1.0  不包含首日补丁"
-            # )
-
-        print("Applying icons...")
-        # apply_icons(writer.book, icon_dir, skip_row=1)
-        apply_icons(writer.book, icon_dir)
-
-    with pd.ExcelWriter("ArmorDataWithIcon.xlsx") as writer:
-        armor_data = append_icon_col_armor(armor_data, armor_series_enum_maker)
-        armor_data.to_excel(writer, sheet_name="Armor", index=False)
-        print("Styling...")
-        autofit.style_workbook(writer.book, max_width=60)
-
-        print("Applying wrap text alignment...")
-        align_wrap = Alignment(wrapText=True)
-        for sheet_name in writer.sheets:
-            sheet = writer.book[sheet_name]
-            # 为所有非表头格应用自动换行
-            for row in sheet.iter_rows(min_row=3):
-                for cell in row:
-                    cell.alignment = align_wrap
-            # # 首行增加一行，加签名
-            # sheet.insert_rows(1)
-            # sheet.cell(row=1, column=1).value = (
-            #     "解包：剧透猎人老金群  制表：Eigeen本征  版本：1.0  不包含首日补丁"
-            # )
-
-        print("Applying icons...")
-        # apply_icons(writer.book, icon_dir, skip_row=1)
-        apply_icons(writer.book, icon_dir)
+    if args.format == "xlsx":
+        print("Compressing icons...")
+        precompress_icons(weapon_sheets, icon_dir, ["Icon"])
+
+    print("Writing weapon data...")
+    pipeline = SheetPipeline()
+    # RARE修正
+    pipeline.add_cell_pass(fix_rare_value_cell)
+    # 为所有非表头格应用自动换行
+    pipeline.add_cell_pass(wrap_all_pass, min_row=3)
+    pipeline.add_cell_pass(icon_cell_pass(icon_dir), min_row=2)
+    with shared_image_media():
+        export_tables(
+            "WeaponDataWithIcon.xlsx",
+            weapon_sheets,
+            args.format,
+            pipeline=pipeline,
+            streaming=args.streaming,
+            max_width=60,
+            column_widths={"Icon": ICON_COLUMN_WIDTH},
+        )
+
+    print("Writing armor data...")
+    armor_data = append_icon_col_armor(armor_data, armor_series_enum_maker)
+    if args.format == "xlsx":
+        precompress_icons({"Armor": armor_data}, icon_dir, ["Icon_A", "Icon_B"])
+    pipeline = SheetPipeline()
+    # 为所有非表头格应用自动换行
+    pipeline.add_cell_pass(wrap_all_pass, min_row=3)
+    pipeline.add_cell_pass(icon_cell_pass(icon_dir), min_row=2)
+    with shared_image_media():
+        export_tables(
+            "ArmorDataWithIcon.xlsx",
+            {"Armor": armor_data},
+            args.format,
+            pipeline=pipeline,
+            streaming=args.streaming,
+            max_width=60,
+            column_widths={"Icon_A": ICON_COLUMN_WIDTH, "Icon_B": ICON_COLUMN_WIDTH},
+        )
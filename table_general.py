@@ -1,14 +1,13 @@
 import json
 import pandas as pd
 
-from library.utils import is_guid_like, minify_nested_serial, remove_enum_value
+from library.table_spec import TableSpec, dump_table
 from library.text_db import get_global_text_db
+from library.user_data import load_user_data
 
 
 def dump_enum_maker(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["ace.user_data.EnumMaker"]["_DataList"]:
@@ -47,31 +46,6 @@ def load_enum_internal() -> dict[str, dict]:
 
 # 常规方法导出user.3数据，转换为DataFrame
 def dump_user3_data_general(path: str, main_type_name: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0][main_type_name]["_Values"]:
-        row = {}
-        for key, value in cData[f"{main_type_name}.cData"].items():
-            if key.startswith("_"):
-                key = key[1:]
-
-            value = minify_nested_serial(value)
-            value = remove_enum_value(value)
-
-            if isinstance(value, str):
-                if is_guid_like(value):
-                    text_db = get_global_text_db()
-                    text = text_db.get_text_by_guid(value)
-                    if text:
-                        value = text.replace("\n", "").replace("\r", "")
-                    else:
-                        value = ""
-
-            row[key] = value
-        table.append(row)
-
-    df = pd.DataFrame(table)
-    return df
+    text_db = get_global_text_db()
+    spec = TableSpec(main_type_name, post=[text_db.resolve_guid_columns])
+    return dump_table(path, spec)
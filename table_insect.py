@@ -1,25 +1,22 @@
-import json
 import pandas as pd
 
-from library.excel_auto_fit import ExcelAutoFit
+from library.export import export_tables, parse_export_args
 from library.utils import (
     remove_enum_value,
     minify_nested_serial,
     reindex_column,
 )
-from library.rare import apply_fix_rare_colors
+from library.rare import fix_rare_color_cell
+from library.sheet_pipeline import SheetPipeline
 from library.text_db import get_global_text_db
 from library.item_db import get_global_item_db
-from table_quest import get_mission_data
-
-text_db = get_global_text_db()
-item_db = get_global_item_db()
+from library.user_data import load_user_data
+from table_quest import get_key_stories, get_mission_data, get_mission_names
 
 
 def dump_insect_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r") as f:
-        data = json.load(f)
+    text_db = get_global_text_db()
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.RodInsectData"]["_Values"]:
@@ -47,9 +44,8 @@ def dump_insect_data(path: str) -> pd.DataFrame:
 def dump_insect_recipe_data(
     path: str, insect_data: pd.DataFrame, mission_data: pd.DataFrame
 ) -> pd.DataFrame:
-    data = None
-    with open(path, "r") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.RodInsectRecipeData"]["_Values"]:
@@ -78,18 +74,7 @@ def dump_insect_recipe_data(
 
     df = pd.DataFrame(table)
     # 增加KeyStory列
-    stories = []
-    for _, row in df.iterrows():
-        id = row["KeyStoryNo"]
-        if not id:
-            stories.append("")
-            continue
-        v = mission_data.loc[mission_data["MissionIDSerial"] == id, "SetLGuideMsgData"]
-        if len(v) > 0:
-            stories.append(v.iloc[0])
-        else:
-            stories.append("")
-    df["KeyStory"] = stories
+    df["KeyStory"] = get_key_stories(df["KeyStoryNo"], get_mission_names(mission_data))
     df = reindex_column(df, column=["KeyStory"], next_to="KeyStoryNo")
     # 替换ID列
     names = []
@@ -119,6 +104,7 @@ def dump_insect_recipe_data(
 
 
 if __name__ == "__main__":
+    args = parse_export_args()
     mission_data = get_mission_data()
 
     insect_data = dump_insect_data(
@@ -130,10 +116,15 @@ if __name__ == "__main__":
         mission_data,
     )
 
-    autofit = ExcelAutoFit()
-    with pd.ExcelWriter("RodInsectCollection.xlsx") as writer:
-        insect_data.to_excel(writer, sheet_name="RodInsectData")
-        insect_recipe_data.to_excel(writer, sheet_name="RodInsectRecipeData")
-
-        apply_fix_rare_colors(writer.book)
-        autofit.style_workbook(writer.book)
+    sheets = {
+        "RodInsectData": insect_data,
+        "RodInsectRecipeData": insect_recipe_data,
+    }
+    export_tables(
+        "RodInsectCollection.xlsx",
+        sheets,
+        args.format,
+        pipeline=SheetPipeline().add_cell_pass(fix_rare_color_cell),
+        streaming=args.streaming,
+        index=True,
+    )
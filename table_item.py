@@ -1,53 +1,27 @@
-import json
 import pandas as pd
-from openpyxl.styles import Alignment
 
-from library.excel_auto_fit import ExcelAutoFit
-from library.rare import apply_fix_rare_colors
-from library.text_db import load_text_db
+from library.export import export_tables, parse_export_args
+from library.rare import fix_rare_color_cell
+from library.sheet_pipeline import SheetPipeline, wrap_text_pass
+from library.table_spec import TableSpec, dump_table
+from library.text_db import TextDB
 from library.item_db import ItemDB
-from library.utils import is_guid_like, rare_enum_to_value, remove_enum_value
-from table_skill import minify_nested_obj
-
-text_db = load_text_db("texts_db.json")
+from library.utils import minify_nested_serial, remove_enum_value
+from library.user_data import load_user_data
+from table_skill import resolve_text_columns
 
 
 def dump_item_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    table = []
-    for cData in data[0]["app.user_data.ItemData"]["_Values"]:
-        cData = cData["app.user_data.ItemData.cData"]
-
-        row = {}
-        for key, value in cData.items():
-            if key.startswith("_"):
-                key = key[1:]
-            value = minify_nested_obj(value)
-            value = remove_enum_value(value)
-
-            if isinstance(value, str):
-                if is_guid_like(value):
-                    text = text_db.get_text_by_guid(value)
-                    if text:
-                        value = text.replace("\n", "").replace("\r", "")
-                        if value.startswith("<COLOR FF0000>#Rejected#</COLOR> "):
-                            value = value[33:]
-                elif value == "INVALID":
-                    value = ""
-            row[key] = value
-        table.append(row)
-
-    df = pd.DataFrame(table)
-    return df
+    spec = TableSpec(
+        "app.user_data.ItemData",
+        value_map={"INVALID": ""},
+        post=[resolve_text_columns],
+    )
+    return dump_table(path, spec)
 
 
 def dump_item_recipe_data(path: str, item_data: pd.DataFrame) -> pd.DataFrame:
-    data = None
-    with open(path, "r") as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.cItemRecipe"]["_Values"]:
@@ -58,7 +32,7 @@ def dump_item_recipe_data(path: str, item_data: pd.DataFrame) -> pd.DataFrame:
             if key.startswith("_"):
                 key = key[1:]
 
-            value = minify_nested_obj(value)
+            value = minify_nested_serial(value)
             value = remove_enum_value(value)
             # replace item_id with item_name
             if isinstance(value, list):
@@ -80,8 +54,11 @@ def dump_item_recipe_data(path: str, item_data: pd.DataFrame) -> pd.DataFrame:
 
 
 if __name__ == "__main__":
-    text_db.set_global_default_lang(1)
-    
+    args = parse_export_args()
+    # 指定 --langs 时使用指定的语言
+    if not args.langs:
+        TextDB.set_global_default_lang(1)
+
     item_data = dump_item_data(
         "natives/STM/GameDesign/Common/Item/itemData.user.3.json"
     )
@@ -94,32 +71,15 @@ if __name__ == "__main__":
         "ItemRecipeData": item_recipe_data,
     }
 
-    auto_fit = ExcelAutoFit()
-    align_wrap = Alignment(wrapText=True)
-    with pd.ExcelWriter("ItemDataCollection.xlsx") as writer:
-        for sheet_name, data in sheets.items():
-            data.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        auto_fit.style_workbook(writer.book)
-        apply_fix_rare_colors(writer.book)
-
-        for sheet_name in writer.sheets:
-            sheet = writer.sheets[sheet_name]
-            # RARE修正
-            for row in range(1, sheet.max_row + 1):
-                for col in range(1, sheet.max_column + 1):
-                    cell = sheet.cell(row=row, column=col)
-                    if isinstance(cell.value, str):
-                        cell.value = rare_enum_to_value(cell.value)
-        # RawExplain列添加自动换行
-        explain_col = None
-        for col in range(1, sheet.max_column + 1):
-            cell = sheet.cell(row=1, column=col)
-            if cell.value == "RawExplain":
-                explain_col = col
-                break
-        if explain_col is not None:
-            for row in range(2, sheet.max_row + 1):
-                cell = sheet.cell(row=row, column=explain_col)
-                if isinstance(cell.value, str):
-                    cell.alignment = align_wrap
+    pipeline = SheetPipeline()
+    # RARE着色并修正为数值
+    pipeline.add_cell_pass(fix_rare_color_cell)
+    # RawExplain列添加自动换行
+    pipeline.add_column_pass(wrap_text_pass, {"RawExplain"}, min_row=2)
+    export_tables(
+        "ItemDataCollection.xlsx",
+        sheets,
+        args.format,
+        pipeline=pipeline,
+        streaming=args.streaming,
+    )
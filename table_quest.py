@@ -1,12 +1,14 @@
-import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
-from library.excel_auto_fit import ExcelAutoFit
-from library.text_db import load_text_db
-from library.utils import remove_enum_value
+import library.text_db
+from library.export import export_tables, parse_export_args
+from library.text_db import get_global_text_db, get_text_db_path
+from library.utils import create_lookup_dict, minify_nested_serial, remove_enum_value
+from library.user_data import load_derived_data, load_user_data
 
-text_db = load_text_db("texts_db.json")
 re_mission_id = re.compile(r"MISSION_(\d+)")
 
 PATH_ROOT = "natives/STM/"
@@ -17,16 +19,19 @@ USELESS_COL_NAMES = {
     "EnemySetDataList",
     "MissionGmSetPrefab",
 }
+# 任务数据中的子UserData引用展开为路径
+QUEST_UNWRAP_KEYS = ("_Value", "userdataPath")
+
+
+MISSION_LIST_PATH = (
+    "natives/STM/GameDesign/Mission/_UserData/MissionListData_00.user.3.json"
+)
+# 并行读取任务文件的线程数
+LOAD_WORKERS = 8
 
 
 def get_mission_ud_paths() -> list[str]:
-    mission_list_data = None
-    with open(
-        "natives/STM/GameDesign/Mission/_UserData/MissionListData_00.user.3.json",
-        "r",
-        encoding="utf-8",
-    ) as f:
-        mission_list_data = json.load(f)
+    mission_list_data = load_user_data(MISSION_LIST_PATH)
 
     paths = []
 
@@ -37,94 +42,112 @@ def get_mission_ud_paths() -> list[str]:
     return paths
 
 
-def minify_nested_obj(obj: dict) -> str | dict:
-    if isinstance(obj, dict) and len(obj) == 1:
-        first_key = list(obj.keys())[0]
-        value = obj[first_key]
-        if "_Value" in value:
-            return value["_Value"]
-        elif "userdataPath" in value:
-            return value["userdataPath"]
-        for k, v in value.items():
-            value[k] = minify_nested_obj(v)
-
-    if isinstance(obj, list):
-        for i in range(len(obj)):
-            obj[i] = minify_nested_obj(obj[i])
-
-    return obj
-
-
 def sort_by_mission_id(obj: dict) -> int:
     id1_num = int(re_mission_id.search(obj["MissionIDSerial"]).group(1))
     return id1_num
 
 
-def get_mission_data() -> pd.DataFrame:
-    mission_ud_paths = get_mission_ud_paths()
-    mission_ud_paths = map(lambda path: PATH_ROOT + path + ".3.json", mission_ud_paths)
-
-    mission_datas = []
-    for mission_ud_path in mission_ud_paths:
-        mission_data = None
-        try:
-            with open(mission_ud_path, "r", encoding="utf-8") as f:
-                mission_data = json.load(f)
-        except Exception as e:
-            print(f"Error loading mission data: {e}")
+# 读取单个任务文件，转换为一行数据，读取失败时返回 None
+def load_mission_row(mission_ud_path: str) -> dict | None:
+    text_db = get_global_text_db()
+    mission_data = None
+    try:
+        mission_data = load_user_data(mission_ud_path)
+    except Exception as e:
+        print(f"Error loading mission data: {e}")
+        return None
+
+    mission_data = mission_data[0]["app.user_data.MissionData"]
+    data = {}
+    for key, value in mission_data.items():
+        if key.startswith("_"):
+            key = key[1:]
+
+        # try minify serial id
+        value = minify_nested_serial(value, QUEST_UNWRAP_KEYS)
+        value = remove_enum_value(value)
+
+        if key == "SetLGuideMsgData":
+            id = value["app.user_data.MissionData.GuideMsgParts"]["SetMsgID"]
+            msg = text_db.get_text_by_guid(id)
+            value = msg or ""
+        elif key == "SetSGuideMsgDataList":
+            curr_i = 0
+            for i, id in enumerate(value):
+                id = id["app.user_data.MissionData.GuideMsgParts"]["SetMsgID"]
+                curr_i = i
+                if i < 5:
+                    data[f"SetSGuideMsgData{i}"] = text_db.get_text_by_guid(id) or ""
+            if curr_i != 4:
+                for i in range(curr_i, 5):
+                    data[f"SetSGuideMsgData{i}"] = ""
+        elif key in USELESS_COL_NAMES:
             continue
+        # # ignore nested objects
+        # if isinstance(value, dict):
+        #     continue
+        # if isinstance(value, list):
+        #     continue
 
-        mission_data = mission_data[0]["app.user_data.MissionData"]
-        data = {}
-        for key, value in mission_data.items():
-            if key.startswith("_"):
-                key = key[1:]
-
-            # try minify serial id
-            value = minify_nested_obj(value)
-            value = remove_enum_value(value)
-
-            if key == "SetLGuideMsgData":
-                id = value["app.user_data.MissionData.GuideMsgParts"]["SetMsgID"]
-                msg = text_db.get_text_by_guid(id)
-                value = msg or ""
-            elif key == "SetSGuideMsgDataList":
-                curr_i = 0
-                for i, id in enumerate(value):
-                    id = id["app.user_data.MissionData.GuideMsgParts"]["SetMsgID"]
-                    curr_i = i
-                    if i < 5:
-                        data[f"SetSGuideMsgData{i}"] = (
-                            text_db.get_text_by_guid(id) or ""
-                        )
-                if curr_i != 4:
-                    for i in range(curr_i, 5):
-                        data[f"SetSGuideMsgData{i}"] = ""
-            elif key in USELESS_COL_NAMES:
-                continue
-            # # ignore nested objects
-            # if isinstance(value, dict):
-            #     continue
-            # if isinstance(value, list):
-            #     continue
-
-            data[key] = value
-        mission_datas.append(data)
+        data[key] = value
+    return data
+
+
+def _load_mission_data(mission_ud_paths: list[str]) -> pd.DataFrame:
+    # 先在主线程加载文本库，避免多个线程同时加载
+    get_global_text_db()
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        rows = executor.map(load_mission_row, mission_ud_paths)
+        mission_datas = [row for row in rows if row is not None]
 
     mission_datas.sort(key=sort_by_mission_id)
     df = pd.DataFrame(mission_datas)
     return df
 
 
+# 任务表按 任务列表、所有任务文件、文本库 的内容hash 和语言持久化缓存
+def get_mission_data() -> pd.DataFrame:
+    mission_ud_paths = [PATH_ROOT + path + ".3.json" for path in get_mission_ud_paths()]
+    input_paths = [MISSION_LIST_PATH, get_text_db_path(), *mission_ud_paths]
+    return load_derived_data(
+        "mission_data",
+        input_paths,
+        lambda: _load_mission_data(mission_ud_paths),
+        extra_key=(library.text_db.g_default_lang,),
+    )
+
+
+# MissionIDSerial -> 任务名（SetLGuideMsgData）
+def get_mission_names(mission_data: pd.DataFrame | None = None) -> dict[str, str]:
+    if mission_data is None:
+        mission_data = get_mission_data()
+    return create_lookup_dict(mission_data, "MissionIDSerial", "SetLGuideMsgData")
+
+
+# 根据 KeyStoryNo 列的任务ID获取任务名
+def get_key_stories(key_story_nos, mission_names: dict[str, str]) -> list[str]:
+    stories = []
+    for id in key_story_nos:
+        if not id:
+            stories.append("")
+            continue
+        stories.append(mission_names.get(id, ""))
+    return stories
+
+
 if __name__ == "__main__":
     # text_db.set_global_default_lang(1)
-    
+    args = parse_export_args()
+
     mission_data = get_mission_data()
 
-    auto_fit = ExcelAutoFit()
-    with pd.ExcelWriter("Missions.xlsx") as writer:
-        mission_data.to_excel(writer, sheet_name="Missions")
-        auto_fit.style_workbook(writer.book)
+    export_tables(
+        "Missions.xlsx",
+        {"Missions": mission_data},
+        args.format,
+        streaming=args.streaming,
+        index=True,
+    )
 
 # with open("Missions.csv", "w", encoding="utf-8", newline="") as f:
 #     writer = csv.DictWriter(f, fieldnames=mission_datas[0].keys())
@@ -1,37 +1,17 @@
-import json
 import os
 import re
 import pandas as pd
 
-from library.item_db import ItemDB
-from library.excel_auto_fit import ExcelAutoFit
+from library.item_db import get_global_item_db
+from library.export import export_tables, parse_export_args
+from library.user_data import load_user_data
+from library.utils import minify_nested_serial
 from table_quest import get_mission_data
 
-item_db = ItemDB("item_db.json")
-
-
-def minify_nested_obj(obj: dict) -> str | dict:
-    if isinstance(obj, dict) and len(obj) == 1:
-        first_key = list(obj.keys())[0]
-        value = obj[first_key]
-        if "_Value" in value:
-            return value["_Value"]
-        # elif "userdataPath" in value:
-        #     return value["userdataPath"]
-        for k, v in value.items():
-            value[k] = minify_nested_obj(v)
-
-    if isinstance(obj, list):
-        for i in range(len(obj)):
-            obj[i] = minify_nested_obj(obj[i])
-
-    return obj
-
 
 def dump_mission_reward(path):
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    data = load_user_data(path)
 
     reward_db = []
     for cData in data[0]["app.user_data.MissionRewardData"]["_Values"]:
@@ -40,7 +20,7 @@ def dump_mission_reward(path):
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            val = minify_nested_obj(value)
+            val = minify_nested_serial(value)
             if isinstance(val, str):
                 item = item_db.get_entry_by_id(val)
                 if item:
@@ -60,9 +40,8 @@ def dump_mission_reward(path):
 
 
 def dump_common_reward(path):
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    data = load_user_data(path)
 
     reward_db = []
     for cData in data[0]["app.user_data.QuestGeneralRewardData"]["_Values"]:
@@ -71,7 +50,7 @@ def dump_common_reward(path):
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            val = minify_nested_obj(value)
+            val = minify_nested_serial(value)
             if isinstance(val, str):
                 item = item_db.get_entry_by_id(val)
                 if item:
@@ -83,20 +62,22 @@ def dump_common_reward(path):
     return df
 
 
-sheets = {
-    "MissionData": get_mission_data(),
-    "MissionRewardData": dump_mission_reward(
-        "natives/STM/GameDesign/Mission/_UserData/_Reward/MissionRewardData.user.3.json"
-    ),
-    "CommonRewardData": dump_common_reward(
-        "natives/STM/GameDesign/Mission/_UserData/_Reward/CommonRewardData.user.3.json"
-    ),
-}
-
-with pd.ExcelWriter("MissionDataCollection.xlsx", engine="openpyxl") as writer:
-    for sheet_name, df in sheets.items():
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-
-autofit = ExcelAutoFit()
-autofit.style_excel("MissionDataCollection.xlsx")
+if __name__ == "__main__":
+    args = parse_export_args()
+
+    sheets = {
+        "MissionData": get_mission_data(),
+        "MissionRewardData": dump_mission_reward(
+            "natives/STM/GameDesign/Mission/_UserData/_Reward/MissionRewardData.user.3.json"
+        ),
+        "CommonRewardData": dump_common_reward(
+            "natives/STM/GameDesign/Mission/_UserData/_Reward/CommonRewardData.user.3.json"
+        ),
+    }
+
+    export_tables(
+        "MissionDataCollection.xlsx",
+        sheets,
+        args.format,
+        streaming=args.streaming,
+    )
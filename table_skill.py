@@ -1,71 +1,61 @@
-import json
 import math
 import re
+import numpy as np
 import pandas as pd
 
 import openpyxl
 from openpyxl.styles import NamedStyle
 from openpyxl.utils import get_column_letter
 
+from library.artifact import artifact
+from library.drop_rate import roll_curves, rolls_for_confidence
 from library.excel_auto_fit import ExcelAutoFit
-from library.item_db import ItemDB
-from library.text_db import load_text_db
-from library.utils import is_guid_like, remove_enum_value, reindex_column
-
-item_db = ItemDB("item_db.json")
-text_db = load_text_db("texts_db.json")
-
+from library.export import export_tables, get_export_path, parse_export_args
+from library.item_db import get_global_item_db
+from library.sheet_pipeline import SheetPipeline, number_format_pass
+from library.table_spec import TableSpec, dump_table
+from library.text_db import get_global_text_db
+from library.utils import (
+    create_lookup_dict,
+    minify_nested_serial,
+    remove_enum_value,
+    reindex_column,
+)
+from library.user_data import load_user_data
+
+# 抽取曲线的最大次数和输出的置信度
+ROLL_CURVE_MAX_ROLLS = 1000
+ROLL_CONFIDENCES = (0.5, 0.9, 0.99)
 re_rare = re.compile(r"^RARE(\d+)$")
 
+REJECTED_PREFIX = "<COLOR FF0000>#Rejected#</COLOR> "
 
-def minify_nested_obj(obj: dict) -> str | dict:
-    if isinstance(obj, dict) and len(obj) == 1:
-        first_key = list(obj.keys())[0]
-        value = obj[first_key]
-        if "_Value" in value:
-            return value["_Value"]
-        for k, v in value.items():
-            value[k] = minify_nested_obj(v)
-
-    if isinstance(obj, list):
-        for i in range(len(obj)):
-            obj[i] = minify_nested_obj(obj[i])
-
-    return obj
 
+# 批量处理GUID，并去除文本的 #Rejected# 前缀
+def resolve_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for col in df.columns:
+        series = df[col]
+        resolved = get_global_text_db().get_texts_by_guids(series, keep_missing=True)
+        if resolved is series:
+            continue
+        df[col] = resolved.apply(strip_rejected_prefix)
+    return df
 
-def dump_skill_common_data(path: str) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    table = []
-    for cData in data[0]["app.user_data.SkillCommonData"]["_Values"]:
-        cData = cData["app.user_data.SkillCommonData.cData"]
+def strip_rejected_prefix(value):
+    if isinstance(value, str) and value.startswith(REJECTED_PREFIX):
+        return value[len(REJECTED_PREFIX) :]
+    return value
 
-        row = {}
-        for key, value in cData.items():
-            if key.startswith("_"):
-                key = key[1:]
-            value = minify_nested_obj(value)
-            value = remove_enum_value(value)
-            if is_guid_like(str(value)):
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                    if value.startswith("<COLOR FF0000>#Rejected#</COLOR> "):
-                        value = value[33:]
-            row[key] = value
-        table.append(row)
 
-    df = pd.DataFrame(table)
-    return df
+@artifact()
+def dump_skill_common_data(path: str) -> pd.DataFrame:
+    spec = TableSpec("app.user_data.SkillCommonData", post=[resolve_text_columns])
+    return dump_table(path, spec)
 
 
 def dump_skill_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.SkillData"]["_Values"]:
@@ -75,7 +65,7 @@ def dump_skill_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFrame:
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            value = minify_nested_obj(value)
+            value = minify_nested_serial(value)
             value = remove_enum_value(value)
 
             if key == "openSkill":
@@ -88,23 +78,18 @@ def dump_skill_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFrame:
                             value[i] = skill_name
                         except:
                             pass
-            if is_guid_like(str(value)):
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-                    if value.startswith("<COLOR FF0000>#Rejected#</COLOR> "):
-                        value = value[33:]
             row[key] = value
         table.append(row)
 
     df = pd.DataFrame(table)
+    df = resolve_text_columns(df)
     return df
 
 
 def dump_accessory_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFrame:
-    data = None
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    item_db = get_global_item_db()
+    text_db = get_global_text_db()
+    data = load_user_data(path)
 
     table = []
     for cData in data[0]["app.user_data.AccessoryData"]["_Values"]:
@@ -114,7 +99,7 @@ def dump_accessory_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFr
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            value = minify_nested_obj(value)
+            value = minify_nested_serial(value)
             value = remove_enum_value(value)
 
             if key == "Skill":
@@ -127,32 +112,25 @@ def dump_accessory_data(path: str, skill_common_data: pd.DataFrame) -> pd.DataFr
             if key == "Rare":
                 match = re_rare.match(value)
                 if match:
-                    value = int(match.group(1)) + 1 
-            if is_guid_like(str(value)):
-                text = text_db.get_text_by_guid(value)
-                if text:
-                    value = text.replace("\n", "").replace("\r", "")
-            else:
-                item = item_db.get_entry_by_id(str(value))
-                if item:
-                    value = item.raw_name
+                    value = int(match.group(1)) + 1
+            # GUID不会匹配到物品，统一在建表后批量处理
+            item = item_db.get_entry_by_id(str(value))
+            if item:
+                value = item.raw_name
             row[key] = value
         table.append(row)
 
     df = pd.DataFrame(table)
+    df = text_db.resolve_guid_columns(df, keep_missing=True)
     return df
 
 
 def dump_accessory_ratio_data(
     judge_path: str, rank_judge_path: str, accessory_data: pd.DataFrame
 ) -> pd.DataFrame:
-    judge_data = None
-    with open(judge_path, "r", encoding="utf-8") as f:
-        judge_data = json.load(f)
+    judge_data = load_user_data(judge_path)
 
-    rank_judge_data = None
-    with open(rank_judge_path, "r", encoding="utf-8") as f:
-        rank_judge_data = json.load(f)
+    rank_judge_data = load_user_data(rank_judge_path)
 
     acc_prob_table = []
     for cData in judge_data[0]["app.user_data.AccessoryJudgeData"]["_Values"]:
@@ -161,7 +139,7 @@ def dump_accessory_ratio_data(
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            value = minify_nested_obj(value)
+            value = minify_nested_serial(value)
             value = remove_enum_value(value)
             row[key] = value
         acc_prob_table.append(row)
@@ -173,7 +151,7 @@ def dump_accessory_ratio_data(
         for key, value in cData.items():
             if key.startswith("_"):
                 key = key[1:]
-            value = minify_nested_obj(value)
+            value = minify_nested_serial(value)
             value = remove_enum_value(value)
 
             # item = item_db.get_entry_by_id(str(value))
@@ -182,58 +160,107 @@ def dump_accessory_ratio_data(
             row[key] = value
         rank_prob_table.append(row)
 
-    sword_pool_weight_sums = [0, 0, 0, 0, 0]  # 每个池的权重之和
-    equip_pool_weight_sums = [0, 0, 0, 0, 0]
+    # 获取珠子类别，ACC_TYPE_00 为武器珠（0号池组），ACC_TYPE_01 为防具珠（1号池组）
+    acc_types = create_lookup_dict(accessory_data, "AccessoryId", "AccessoryType")
+    acc_ids = []
+    acc_type_list = []
+    acc_groups = []
     for acc_row in acc_prob_table:
-        # 获取珠子类别
-        acc_type = accessory_data.loc[
-            accessory_data["AccessoryId"] == acc_row["AccessoryId"], "AccessoryType"
-        ].iloc[0]
-        for i in range(len(acc_row["Probability"])):
-            if acc_type.find("ACC_TYPE_00") != -1:
-                sword_pool_weight_sums[i] += acc_row["Probability"][i]
-            elif acc_type.find("ACC_TYPE_01") != -1:
-                equip_pool_weight_sums[i] += acc_row["Probability"][i]
-            else:
-                print("unknown accessory type: ", acc_type)
-    print("sword_pool_weight_sums: ", sword_pool_weight_sums)
-    print("equip_pool_weight_sums: ", equip_pool_weight_sums)
-
-    out_data = {}
-    for acc_row in acc_prob_table:
-        row = {}
-        # 获取珠子类别
-        acc_type = accessory_data.loc[
-            accessory_data["AccessoryId"] == acc_row["AccessoryId"], "AccessoryType"
-        ].iloc[0]
-        pool_weight_sums = None
+        acc_type = acc_types[acc_row["AccessoryId"]]
         if acc_type.find("ACC_TYPE_00") != -1:
-            pool_weight_sums = sword_pool_weight_sums
+            acc_groups.append(0)
         elif acc_type.find("ACC_TYPE_01") != -1:
-            pool_weight_sums = equip_pool_weight_sums
+            acc_groups.append(1)
         else:
             print("unknown accessory type: ", acc_type)
-            continue
-        for rank_row in rank_prob_table:
-            if rank_row["AccessoryType"] != acc_type:
-                row[rank_row["ItemId"]] = 0
+            acc_groups.append(-1)
+        acc_ids.append(acc_row["AccessoryId"])
+        acc_type_list.append(acc_type)
+    acc_groups = np.array(acc_groups)
+    acc_type_list = np.array(acc_type_list, dtype=object)
+
+    # 珠子 x 池 的权重矩阵
+    acc_weights = np.array([acc_row["Probability"] for acc_row in acc_prob_table])
+    pool_weight_sums = np.stack(
+        [acc_weights[acc_groups == group].sum(axis=0) for group in (0, 1)]
+    )  # 每个池的权重之和
+    print("sword_pool_weight_sums: ", pool_weight_sums[0].tolist())
+    print("equip_pool_weight_sums: ", pool_weight_sums[1].tolist())
+
+    # 稀有度道具 x 池 的概率矩阵，每行按行内总和归一化
+    rank_weights = np.array([rank_row["Probability"] for rank_row in rank_prob_table])
+    rank_ratios = rank_weights / rank_weights.sum(axis=1, keepdims=True)
+    rank_types = np.array(
+        [rank_row["AccessoryType"] for rank_row in rank_prob_table], dtype=object
+    )
+
+    # 同类别的 珠子 x 稀有度道具 概率为各池概率乘积之和，其余为0
+    # 按池依次累加，与逐个计算时的浮点结果一致
+    ratios = np.zeros((len(acc_ids), len(rank_prob_table)))
+    for acc_type in dict.fromkeys(acc_type_list[acc_groups >= 0]):
+        acc_mask = acc_type_list == acc_type
+        rank_mask = rank_types == acc_type
+        group = acc_groups[acc_mask][0]
+        block = 0
+        for pool_idx, pool_weight_sum in enumerate(pool_weight_sums[group]):
+            if pool_weight_sum == 0:
                 continue
-            acc_ratio = 0
-            for pool_idx, pool_weight in enumerate(acc_row["Probability"]):
-                if pool_weight_sums[pool_idx] == 0:
-                    continue
-                pool_ratio = pool_weight / pool_weight_sums[pool_idx]
-                rank_ratio = rank_row["Probability"][pool_idx] / sum(
-                    rank_row["Probability"]
-                )
-                acc_ratio += pool_ratio * rank_ratio
-            row[rank_row["ItemId"]] = acc_ratio
-        out_data[acc_row["AccessoryId"]] = row
-
-    df = pd.DataFrame(out_data).T
+            pool_ratios = acc_weights[acc_mask, pool_idx] / pool_weight_sum
+            block = block + np.outer(pool_ratios, rank_ratios[rank_mask, pool_idx])
+        ratios[np.ix_(acc_mask, rank_mask)] = block
+
+    # 重复的ID以最后一次出现的值为准，位置以首次出现为准
+    row_positions = {}
+    for i, acc_id in enumerate(acc_ids):
+        if acc_groups[i] >= 0:
+            row_positions[acc_id] = i
+    col_positions = {}
+    for i, rank_row in enumerate(rank_prob_table):
+        col_positions[rank_row["ItemId"]] = i
+
+    df = pd.DataFrame(
+        ratios[np.ix_(list(row_positions.values()), list(col_positions.values()))],
+        index=list(row_positions),
+        columns=list(col_positions),
+    )
     return df
 
 
+# 每个珠子在每种宝珠下，N 次内至少获得一次的概率曲线
+# 每行为一个 珠子-宝珠 组合（只含概率大于0的），包含各置信度所需的宝珠数和 1~max_rolls 次的累计概率
+def dump_accessory_roll_curves(
+    accessory_percent_data: pd.DataFrame,
+    max_rolls: int = ROLL_CURVE_MAX_ROLLS,
+    confidences: tuple[float, ...] = ROLL_CONFIDENCES,
+) -> pd.DataFrame:
+    prob_columns = [
+        col
+        for col in accessory_percent_data.columns
+        if isinstance(col, str) and col.startswith("Prob: ")
+    ]
+    probs = accessory_percent_data[prob_columns].to_numpy(dtype=float)
+    acc_indices, orb_indices = np.nonzero(probs > 0)
+    pair_probs = probs[acc_indices, orb_indices]
+
+    id_columns = [
+        col
+        for col in ["AccessoryId", "Name", "Rare"]
+        if col in accessory_percent_data.columns
+    ]
+    df = accessory_percent_data.iloc[acc_indices][id_columns].reset_index(drop=True)
+    df["Orb"] = [prob_columns[i][len("Prob: ") :] for i in orb_indices]
+    df["Prob"] = pair_probs
+    df["Mean"] = 1 / pair_probs
+    for confidence in confidences:
+        df[f"N@{confidence * 100:g}%"] = rolls_for_confidence(pair_probs, confidence)
+
+    curves = pd.DataFrame(
+        roll_curves(pair_probs, max_rolls),
+        columns=[f"N={n}" for n in range(1, max_rolls + 1)],
+    )
+    return pd.concat([df, curves], axis=1)
+
+
 def export_percent_pretty(accessory_percent_data: pd.DataFrame):
     # 导出美化的珠子爆率表
     accessory_prob_pretty_data = accessory_percent_data.copy()
@@ -277,7 +304,9 @@ def export_percent_pretty(accessory_percent_data: pd.DataFrame):
     # print(accessory_prob_pretty_data)
 
     autofit = ExcelAutoFit()
-    with pd.ExcelWriter("AccessoryPercentPretty.xlsx", engine="openpyxl") as writer:
+    with pd.ExcelWriter(
+        get_export_path("AccessoryPercentPretty.xlsx"), engine="openpyxl"
+    ) as writer:
         accessory_prob_pretty_data.to_excel(
             writer, sheet_name="AccessoryPercent", index=False
         )
@@ -300,11 +329,12 @@ def export_percent_pretty(accessory_percent_data: pd.DataFrame):
                     if isinstance(cell.value, (int, float)):  # 检查单元格的值是否为数字
                         cell.style = percent3_style  # 应用样式
 
-        autofit.style_workbook(writer.book)
+        autofit.fit_sheet(sheet, accessory_prob_pretty_data)
 
 
 if __name__ == "__main__":
     # text_db.set_global_default_lang(13)
+    args = parse_export_args()
 
     skill_common_data = dump_skill_common_data(
         "natives/STM/GameDesign/Common/Equip/SkillCommonData.user.3.json"
@@ -325,7 +355,7 @@ if __name__ == "__main__":
 
     # 替换索引的Acc ID为名称
     for col_name in accessory_data.columns:
-        name = item_db.get_entry_by_id(col_name)
+        name = get_global_item_db().get_entry_by_id(col_name)
         if name:
             accessory_data.rename(
                 columns={col_name: f"Prob: {name.raw_name}"}, inplace=True
@@ -341,23 +371,18 @@ if __name__ == "__main__":
         "AccessoryData": accessory_data,
     }
 
-    autofit = ExcelAutoFit()
-    with pd.ExcelWriter("SkillCollection.xlsx", engine="openpyxl") as writer:
-        for sheet_name, df in sheets.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-        autofit.style_workbook(writer.book)
-
-        # 修订格式
-        percent3_style = NamedStyle(name="percent3_style", number_format="0.000%")
-        sheet = writer.book["AccessoryData"]
-        # 遍历列头
-        for col in sheet.iter_cols(1, sheet.max_column):
-            column_header = col[0].value  # 获取列头的值
-            if column_header.startswith("Prob: "):
-                col_letter = get_column_letter(col[0].column)  # 获取列字母
-                for cell in sheet[col_letter]:
-                    if isinstance(cell.value, (int, float)):  # 检查单元格的值是否为数字
-                        cell.style = percent3_style  # 应用样式
+    # 修订格式，概率列显示为百分比
+    pipeline = SheetPipeline().add_column_pass(
+        number_format_pass("0.000%"),
+        lambda header: isinstance(header, str) and header.startswith("Prob: "),
+    )
+    export_tables(
+        "SkillCollection.xlsx",
+        sheets,
+        args.format,
+        pipeline=pipeline,
+        streaming=args.streaming,
+    )
 
     # 导出额外分表
     accessory_percent_data = accessory_data.copy()
@@ -390,11 +415,26 @@ if __name__ == "__main__":
             if cell_new != cell:
                 accessory_percent_data.at[idx, col] = cell_new
 
-    with pd.ExcelWriter("AccessoryPercent.xlsx", engine="openpyxl") as writer:
-        accessory_percent_data.to_excel(
-            writer, sheet_name="AccessoryPercent", index=False
-        )
-    autofit.style_excel("AccessoryPercent.xlsx")
+    export_tables(
+        "AccessoryPercent.xlsx",
+        {"AccessoryPercent": accessory_percent_data},
+        args.format,
+        streaming=args.streaming,
+    )
+
+    # 多次抽取的累计概率曲线，列数较多，xlsx 使用流式写入
+    pipeline = SheetPipeline().add_column_pass(
+        number_format_pass("0.000%"),
+        lambda header: header == "Prob"
+        or (isinstance(header, str) and header.startswith("N=")),
+    )
+    export_tables(
+        "AccessoryRollCurve.xlsx",
+        {"AccessoryRollCurve": dump_accessory_roll_curves(accessory_percent_data)},
+        args.format,
+        pipeline=pipeline,
+        streaming=True,
+    )
 
     # accessory_ratio_data_raw = accessory_ratio_data.copy()
     # for col in accessory_ratio_data_raw.columns:
@@ -407,4 +447,6 @@ if __name__ == "__main__":
     #         accessory_ratio_data_raw.rename(columns={col: col_new}, inplace=True)
     # accessory_ratio_data_raw.to_csv("AccessoryPercentRaw.csv")
 
-    export_percent_pretty(accessory_percent_data)
+    # 仅用于xlsx展示的格式化分表
+    if args.format == "xlsx":
+        export_percent_pretty(accessory_percent_data)
@@ -1,9 +1,9 @@
 import os
 import re
 
-from library.text_db import load_text_db
+from library.text_db import g_default_lang, load_text_db
 
-text_db = load_text_db("texts_db.json")
+text_db = load_text_db("texts_db.json", langs=[g_default_lang])
 
 input_dir = "natives"
 output_dir = "natives_xref_replaced"
@@ -0,0 +1,79 @@
+import argparse
+import filecmp
+import os
+import subprocess
+import sys
+import zipfile
+
+from library.export import get_lang_path
+from library.text_db import g_default_lang
+
+# xlsx 中记录创建/修改时间的文件，每次导出都不同，不参与比较
+XLSX_VOLATILE_MEMBERS = {"docProps/core.xml"}
+
+
+def _xlsx_equal(path_a: str, path_b: str) -> bool:
+    with zipfile.ZipFile(path_a) as a, zipfile.ZipFile(path_b) as b:
+        names = set(a.namelist()) - XLSX_VOLATILE_MEMBERS
+        if names != set(b.namelist()) - XLSX_VOLATILE_MEMBERS:
+            return False
+        return all(a.read(name) == b.read(name) for name in names)
+
+
+# 比较两个导出结果，目录（parquet/arrow/csv）逐个文件比较，返回不一致的文件
+def compare_outputs(path_a: str, path_b: str) -> list[str]:
+    if os.path.isdir(path_a):
+        if not os.path.isdir(path_b):
+            return [path_a]
+        names = sorted(set(os.listdir(path_a)) | set(os.listdir(path_b)))
+        diffs = []
+        for name in names:
+            diffs.extend(
+                compare_outputs(os.path.join(path_a, name), os.path.join(path_b, name))
+            )
+        return diffs
+    if not os.path.isfile(path_a) or not os.path.isfile(path_b):
+        return [path_a]
+    if path_a.endswith(".xlsx"):
+        equal = _xlsx_equal(path_a, path_b)
+    else:
+        equal = filecmp.cmp(path_a, path_b, shallow=False)
+    return [] if equal else [path_a]
+
+
+if __name__ == "__main__":
+    # 检查 --langs <lang> 的导出与默认语言运行的导出完全一致
+    # 例: python tool_check_multi_lang.py table_equip.py EquipCollection.xlsx -- --format csv
+    # 默认运行使用 item_db.json，--langs 时物品名直接从 natives 读取，两者需对应同一版本数据
+    parser = argparse.ArgumentParser()
+    parser.add_argument("script", help="导出脚本，如 table_equip.py")
+    parser.add_argument("output", help="默认运行时的输出路径，如 EquipCollection.xlsx")
+    parser.add_argument(
+        "--lang", type=int, default=g_default_lang, help="脚本默认使用的语言id"
+    )
+    # 其余参数（-- 之后的部分）原样传给导出脚本
+    args, script_args = parser.parse_known_args()
+    args.script_args = [arg for arg in script_args if arg != "--"]
+
+    output = args.output
+    if not args.script_args or "--format" not in args.script_args:
+        fmt = "xlsx"
+    else:
+        fmt = args.script_args[args.script_args.index("--format") + 1]
+    if fmt in ("parquet", "arrow", "csv"):
+        output = os.path.splitext(output)[0]
+    elif fmt == "sqlite":
+        output = os.path.splitext(output)[0] + ".sqlite"
+
+    subprocess.run([sys.executable, args.script, *args.script_args], check=True)
+    subprocess.run(
+        [sys.executable, args.script, *args.script_args, "--langs", str(args.lang)],
+        check=True,
+    )
+
+    lang_output = get_lang_path(output, args.lang)
+    diffs = compare_outputs(output, lang_output)
+    if diffs:
+        print(f"{output} and {lang_output} differ: {diffs}")
+        sys.exit(1)
+    print(f"{output} and {lang_output} are identical")